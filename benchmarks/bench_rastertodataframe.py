@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""Benchmarks of :func:`rastertodataframe.raster_to_dataframe`."""
+import os
+
+from rastertodataframe import raster_to_dataframe
+
+from . import data
+
+
+class RasterToDataFrame(object):
+    """All pixels of a raster, without a vector."""
+    params = list(data.RASTERS)
+    param_names = ['raster']
+    timeout = 600
+
+    def setup_cache(self):
+        return data.make_rasters(os.getcwd())
+
+    def setup(self, paths, raster):
+        self.raster_path = paths[raster]
+        self.num_pixels = data.num_pixels(self.raster_path)
+
+    def time_raster_to_dataframe(self, paths, raster):
+        raster_to_dataframe(self.raster_path)
+
+    def peakmem_raster_to_dataframe(self, paths, raster):
+        raster_to_dataframe(self.raster_path)
+
+    def track_throughput(self, paths, raster):
+        def run():
+            raster_to_dataframe(self.raster_path)
+            return self.num_pixels
+        return data.throughput(run)
+    track_throughput.unit = 'pixels/s'
+
+
+class RasterToDataFrameVector(object):
+    """Pixels of a raster touched by the polygons of a vector."""
+    params = data.NUM_POLYGONS
+    param_names = ['num_polygons']
+    timeout = 600
+
+    def setup_cache(self):
+        return data.make_vectors(os.getcwd())
+
+    def setup(self, paths, num_polygons):
+        self.raster_path = paths[0]
+        self.vector_path = paths[1][num_polygons]
+
+    def time_raster_to_dataframe(self, paths, num_polygons):
+        raster_to_dataframe(self.raster_path, vector_path=self.vector_path)
+
+    def peakmem_raster_to_dataframe(self, paths, num_polygons):
+        raster_to_dataframe(self.raster_path, vector_path=self.vector_path)
+
+    def track_throughput(self, paths, num_polygons):
+        # Band pixels extracted, the raster outside the polygons is not read.
+        def run():
+            df = raster_to_dataframe(
+                self.raster_path, vector_path=self.vector_path)
+            return len(df) * data.RASTERS[data.VECTOR_RASTER]['bands']
+        return data.throughput(run)
+    track_throughput.unit = 'pixels/s'
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+"""Benchmarks of :func:`rastertodataframe.tiling.tiles`."""
+import os
+
+from osgeo import gdal
+
+from rastertodataframe import tiling
+
+from . import data
+
+
+class Tiles(object):
+    """Read a whole raster in windows, native blocks and 256x256 pixels."""
+    params = [list(data.RASTERS), [True, False]]
+    param_names = ['raster', 'block_aligned']
+    timeout = 600
+
+    def setup_cache(self):
+        return data.make_rasters(os.getcwd())
+
+    def setup(self, paths, raster, block_aligned):
+        self.ras = gdal.Open(paths[raster])
+        self.num_pixels = data.num_pixels(paths[raster])
+
+    def _read(self, block_aligned):
+        for _ in tiling.tiles(self.ras, size=256,
+                              block_aligned=block_aligned):
+            pass
+
+    def time_tiles(self, paths, raster, block_aligned):
+        self._read(block_aligned)
+
+    def peakmem_tiles(self, paths, raster, block_aligned):
+        self._read(block_aligned)
+
+    def track_throughput(self, paths, raster, block_aligned):
+        def run():
+            self._read(block_aligned)
+            return self.num_pixels
+        return data.throughput(run)
+    track_throughput.unit = 'pixels/s'
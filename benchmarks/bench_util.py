@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+"""Benchmarks of :mod:`rastertodataframe.util`."""
+import os
+
+from osgeo import gdal
+
+from rastertodataframe import util
+
+from . import data
+
+
+class BurnVectorMask(object):
+    """Burn the feature IDs of a vector into an in memory mask."""
+    params = data.NUM_POLYGONS
+    param_names = ['num_polygons']
+    timeout = 600
+
+    def setup_cache(self):
+        return data.make_vectors(os.getcwd())
+
+    def setup(self, paths, num_polygons):
+        self.raster_path = paths[0]
+        self.vector_path = paths[1][num_polygons]
+        ras = gdal.Open(self.raster_path)
+        self.num_pixels = ras.RasterXSize * ras.RasterYSize
+
+    def _burn(self):
+        util.burn_vector_mask_into_raster(
+            self.raster_path, self.vector_path, vector_field='value',
+            dtype=gdal.GDT_Int32)
+
+    def time_burn_vector_mask_into_raster(self, paths, num_polygons):
+        self._burn()
+
+    def peakmem_burn_vector_mask_into_raster(self, paths, num_polygons):
+        self._burn()
+
+    def track_throughput(self, paths, num_polygons):
+        # Mask pixels written.
+        def run():
+            self._burn()
+            return self.num_pixels
+        return data.throughput(run)
+    track_throughput.unit = 'pixels/s'
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""Synthetic rasters and vectors for the benchmarks.
+
+All data is random but seeded, so every run reads the same pixels and
+features.
+"""
+import os
+import timeit
+
+import numpy as np
+import geopandas as gpd
+from osgeo import gdal, osr
+from shapely.geometry import box
+
+# Grid of the synthetic rasters, 10m pixels in UTM zone 32N.
+EPSG = 32632
+ORIGIN = (500000.0, 5000000.0)
+PIXEL_SIZE = 10.0
+
+# Named raster configurations, used as benchmark parameters.
+RASTERS = {
+    '512px-1b-uint8-strip': dict(
+        size=512, bands=1, dtype='uint8', tiled=False, compress=None),
+    '2048px-4b-uint16-strip': dict(
+        size=2048, bands=4, dtype='uint16', tiled=False, compress=None),
+    '2048px-4b-uint16-tiled': dict(
+        size=2048, bands=4, dtype='uint16', tiled=True, compress=None),
+    '2048px-4b-uint16-deflate': dict(
+        size=2048, bands=4, dtype='uint16', tiled=True, compress='DEFLATE'),
+    '2048px-4b-float32-tiled': dict(
+        size=2048, bands=4, dtype='float32', tiled=True, compress=None),
+    '4096px-1b-uint16-tiled': dict(
+        size=4096, bands=1, dtype='uint16', tiled=True, compress=None),
+}
+
+# Raster the vectors are drawn over.
+VECTOR_RASTER = '2048px-4b-uint16-tiled'
+
+# Number of polygons of the vectors, used as benchmark parameters.
+NUM_POLYGONS = [10, 1000, 100000]
+
+
+def make_raster(path, size, bands, dtype, tiled=False, compress=None,
+                seed=0):
+    """Write a square GeoTIFF of random pixels.
+
+    Parameters
+    ----------
+    path : str
+        Path of the output GeoTIFF.
+    size : int
+        Width and height in pixels.
+    bands : int
+        Number of bands.
+    dtype : str
+        Numpy data type of the bands, e.g. 'uint16'.
+    tiled : bool
+        If True, write 256x256 tiles, else strips.
+    compress : str or None
+        GDAL compression, e.g. 'DEFLATE'. If None, not compressed.
+    seed : int
+        Seed of the random pixels.
+
+    Returns
+    -------
+    str
+        ``path``.
+    """
+    options = ['TILED=YES'] if tiled else []
+    if compress is not None:
+        options.append('COMPRESS={}'.format(compress))
+
+    gdal_dtype = gdal.GetDataTypeByName(
+        {'uint8': 'Byte', 'uint16': 'UInt16', 'int16': 'Int16',
+         'uint32': 'UInt32', 'int32': 'Int32', 'float32': 'Float32',
+         'float64': 'Float64'}[dtype])
+    driver = gdal.GetDriverByName('GTiff')
+    ras = driver.Create(path, size, size, bands, gdal_dtype, options=options)
+    ras.SetGeoTransform(
+        [ORIGIN[0], PIXEL_SIZE, 0, ORIGIN[1], 0, -PIXEL_SIZE])
+    srs = osr.SpatialReference()
+    srs.ImportFromEPSG(EPSG)
+    ras.SetProjection(srs.ExportToWkt())
+
+    # Written in blocks of rows so large rasters are not held in memory.
+    rng = np.random.RandomState(seed)
+    high = 1000 if np.dtype(dtype).itemsize > 1 else 255
+    rows = 256
+    for band in range(1, bands + 1):
+        out_band = ras.GetRasterBand(band)
+        for yoff in range(0, size, rows):
+            arr = rng.randint(0, high, size=(min(rows, size - yoff), size))
+            out_band.WriteArray(arr.astype(dtype), 0, yoff)
+    ras.FlushCache()
+    ras = None
+    return path
+
+
+def make_vector(path, size, num_polygons, coverage=0.25, seed=0):
+    """Write a GeoPackage of random, possibly overlapping, rectangles.
+
+    The rectangles are sized so that together they cover about ``coverage``
+    of the raster, whatever their number.
+
+    Parameters
+    ----------
+    path : str
+        Path of the output GeoPackage.
+    size : int
+        Width and height in pixels of the raster the rectangles are drawn
+        over. See :func:`make_raster`.
+    num_polygons : int
+        Number of rectangles.
+    coverage : float
+        Fraction of the raster covered by the rectangles.
+    seed : int
+        Seed of the random rectangles.
+
+    Returns
+    -------
+    str
+        ``path``.
+    """
+    rng = np.random.RandomState(seed)
+    extent = size * PIXEL_SIZE
+    mean_side = extent * np.sqrt(coverage / num_polygons)
+    sides = rng.uniform(0.5, 1.5, size=(num_polygons, 2)) * mean_side
+    mins = rng.uniform(0, 1, size=(num_polygons, 2)) * (extent - sides)
+
+    geometry = [
+        box(ORIGIN[0] + x, ORIGIN[1] - y - h, ORIGIN[0] + x + w, ORIGIN[1] - y)
+        for (x, y), (w, h) in zip(mins, sides)]
+    gdf = gpd.GeoDataFrame(
+        {'value': rng.randint(0, 10, size=num_polygons)},
+        geometry=geometry, crs='EPSG:{}'.format(EPSG))
+    gdf.to_file(path, driver='GPKG')
+    return path
+
+
+def make_rasters(data_dir, names=None):
+    """Write the rasters of :data:`RASTERS`.
+
+    Returns
+    -------
+    dict
+        Path of each raster, by name.
+    """
+    paths = {}
+    for name in names or RASTERS:
+        paths[name] = make_raster(
+            os.path.join(data_dir, name + '.tif'), **RASTERS[name])
+    return paths
+
+
+def make_vectors(data_dir):
+    """Write the raster :data:`VECTOR_RASTER` and a vector over it for each
+    number of polygons in :data:`NUM_POLYGONS`.
+
+    Returns
+    -------
+    tuple
+        Path of the raster and the path of each vector, by number of
+        polygons.
+    """
+    raster_path = make_rasters(data_dir, [VECTOR_RASTER])[VECTOR_RASTER]
+    size = RASTERS[VECTOR_RASTER]['size']
+    vector_paths = {}
+    for num_polygons in NUM_POLYGONS:
+        vector_paths[num_polygons] = make_vector(
+            os.path.join(data_dir, 'polygons_{}.gpkg'.format(num_polygons)),
+            size, num_polygons)
+    return raster_path, vector_paths
+
+
+def num_pixels(raster_path):
+    """Number of pixels of a raster, over all bands."""
+    ras = gdal.Open(raster_path)
+    return ras.RasterXSize * ras.RasterYSize * ras.RasterCount
+
+
+def throughput(func):
+    """Time one call of ``func``, which returns the number of pixels it
+    processed, and return the pixels processed per second.
+    """
+    start = timeit.default_timer()
+    pixels = func()
+    return pixels / (timeit.default_timer() - start)
@@ -9,3 +9,4 @@ __version__ = '0.2.1'
 from .rastertodataframe import *
 from .util import *
 from .tiling import *
+from .cache import *
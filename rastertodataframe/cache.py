@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""Persistent cache of vector masks burned into a raster grid."""
+import os
+import glob
+import uuid
+import hashlib
+import logging
+
+from osgeo import gdal
+
+from rastertodataframe import util
+
+log = logging.getLogger(__name__)
+
+
+class MaskCache(object):
+    """Directory of burned vector masks, reused across rasters on one grid.
+
+    A mask only depends on the raster grid (geotransform, size and
+    projection) and on the vector geometries, so rasters sharing a grid (e.g.
+    a time series) and a vector are burned once. Masks are stored as
+    compressed GeoTIFFs and the least recently used are removed once the
+    cache is larger than ``max_size``.
+
+    Parameters
+    ----------
+    cache_dir : str
+        Directory to store the masks in, created if it does not exist.
+    max_size : int
+        Maximum size of the cache in bytes. The most recently used mask is
+        always kept, even if larger.
+    """
+
+    def __init__(self, cache_dir, max_size=2 ** 30):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+
+    @staticmethod
+    def key(ras, vec_gdf, vector_field='__fid__'):
+        """Hash of the raster grid and the vector geometries.
+
+        Parameters
+        ----------
+        ras : gdal.Dataset
+        vec_gdf : gpd.GeoDataFrame
+        vector_field : str
+            Field of ``vec_gdf`` the mask is burned with.
+
+        Returns
+        -------
+        str
+        """
+        digest = hashlib.sha1()
+        digest.update(repr((tuple(ras.GetGeoTransform()), ras.RasterXSize,
+                            ras.RasterYSize)).encode('utf-8'))
+        digest.update(ras.GetProjectionRef().encode('utf-8'))
+        digest.update(vec_gdf[vector_field].values.tobytes())
+        for geom in vec_gdf.geometry:
+            wkb = b'' if geom is None else geom.wkb
+            digest.update(str(len(wkb)).encode('utf-8'))
+            digest.update(wkb)
+        return digest.hexdigest()
+
+    def path(self, key):
+        """Path of the mask with a given key."""
+        return os.path.join(self.cache_dir, '{}.tif'.format(key))
+
+    def get_mask(self, raster_path, vec_gdf, vector_field='__fid__',
+                 dtype=gdal.GDT_Int32):
+        """Open the mask of a vector on the grid of a raster, burning it if
+        not cached.
+
+        Parameters
+        ----------
+        raster_path : str
+        vec_gdf : gpd.GeoDataFrame
+        vector_field : str
+            Field of ``vec_gdf`` to burn values from.
+        dtype : int
+            GDAL data type of the mask.
+
+        Returns
+        -------
+        gdal.Dataset
+        """
+        key = self.key(util.open_raster(raster_path), vec_gdf, vector_field)
+        mask_path = self.path(key)
+
+        if os.path.exists(mask_path):
+            log.debug('Mask cache hit: %s', mask_path)
+            # The modification time orders masks by last use.
+            os.utime(mask_path, None)
+            return util.open_raster(mask_path)
+
+        # Burn to a temporary name then rename, so other processes never
+        # open a partial mask.
+        log.debug('Mask cache miss: %s', mask_path)
+        tmp_path = os.path.join(
+            self.cache_dir, '{}.tmp'.format(uuid.uuid1()))
+        try:
+            util.burn_vector_mask_into_raster(
+                raster_path, vec_gdf, tmp_path, vector_field=vector_field,
+                dtype=dtype, driver_name='GTiff', creation_options=[
+                    'TILED=YES', 'COMPRESS=DEFLATE'])
+            os.replace(tmp_path, mask_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        self.evict(keep=mask_path)
+        return util.open_raster(mask_path)
+
+    def evict(self, keep=None):
+        """Remove the least recently used masks until the cache fits in
+        ``max_size``.
+
+        Parameters
+        ----------
+        keep : str or None
+            Path of a mask never to remove.
+        """
+        masks = []
+        for mask_path in glob.glob(os.path.join(self.cache_dir, '*.tif')):
+            try:
+                stat = os.stat(mask_path)
+            except OSError:
+                continue
+            masks.append((stat.st_mtime, stat.st_size, mask_path))
+
+        total = sum(size for _, size, _ in masks)
+        for _, size, mask_path in sorted(masks):
+            if total <= self.max_size:
+                break
+            if mask_path == keep:
+                continue
+            log.debug('Mask cache evict: %s', mask_path)
+            try:
+                os.remove(mask_path)
+            except OSError:
+                continue
+            total -= size
@@ -1,111 +1,1357 @@
 # -*- coding: utf-8 -*-
 import os
 import logging
+import itertools
 import tempfile
 import uuid
 import shutil
+import collections
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
 import pandas as pd
+from pandas.api.types import is_numeric_dtype
+from osgeo import gdal, gdal_array
 
 from rastertodataframe import util, tiling
+from rastertodataframe.cache import MaskCache
 
 log = logging.getLogger(__name__)
 
 
-def raster_to_dataframe(raster_path, vector_path=None):
+class _RasterPixels(object):
+    """Pixels of a raster, optionally masked by a vector, read in windows.
+
+    Holds the state shared by the conversion functions: the open raster, the
+    burned vector mask, the vector attributes and any temporary files. Use as
+    a context manager to remove temporary files.
+
+    Parameters
+    ----------
+    raster_path : str or list of str
+        Path to raster file, or paths to rasters on the same grid whose bands
+        are stacked side by side.
+    vector_path : str
+        Optional path to vector file. If given, raster pixels will be extracted
+        from features in the vector. If None, all raster pixels are converted.
+    in_memory : bool
+        If True (default), the vector mask is rasterized into a compressed
+        GeoTIFF in memory. Set to False to write the mask to a temporary file
+        instead.
+    tile_size : int
+        Size in pixels of the tiles the raster is read in.
+    block_aligned : bool
+        If True (default), tiles are adjusted to be made of whole blocks of
+        the raster so each block is only read once.
+    nodata : str or None
+        How to handle no data pixels, from the band no data values and GDAL
+        mask bands. 'any' drops a pixel if any band is no data, 'all' drops a
+        pixel only if all bands are no data and 'nan' converts no data values
+        to NaN. If None (default), no data pixels are kept as they are.
+    workers : int or None
+        Number of threads to extract tiles with. Each thread reads the raster
+        with its own dataset handle. Tiles are returned in the same order as
+        without workers. If None (default), tiles are extracted in the calling
+        thread.
+    categorical : bool
+        If True, non-numeric vector attributes are returned as categorical
+        (dictionary encoded) columns.
+    overlap : bool
+        If True, pixels touched by more than one (overlapping) feature are
+        returned once for every feature. Otherwise only the last feature is
+        kept.
+    mask_cache : str or MaskCache or None
+        Cache (or its directory) to reuse burned vector masks from.
+    suffixes : list of str or None
+        Suffixes of the band names of each raster, when ``raster_path`` is a
+        list of rasters. If None, the raster file names are used.
+    reproject : str or None
+        How to handle a vector with a different EPSG to the raster. 'vector'
+        transforms the vector to the raster EPSG in memory, 'raster' warps the
+        raster to the vector EPSG through a VRT and None raises an error.
+    band_list : list of int or None
+        Band numbers (1-based) to read, of each raster. If None, all bands.
+    resolution : int or None
+        Factor to reduce the resolution by, using overviews where they exist.
+    coords : bool
+        If True, the row, column and map coordinates of each pixel are
+        returned.
+    memory_budget : int or None
+        Maximum size in bytes of the pixels read for a window, used to choose
+        the window size instead of ``tile_size``.
+    prefetch : int
+        Number of windows to read ahead on background threads while the
+        calling thread extracts the current one. Not used with ``workers``.
+    windows : list of tuple or None
+        Windows to read, a subset of the windows the options above give. If
+        None, all windows (touched by the vector) are read.
+    window_size : tuple of int or None
+        Size of the windows of the grid ``windows`` are on, if already
+        planned (e.g. for the whole vector rather than a subset of it).
+    points : bool or None
+        Whether to read the vector as points, one pixel per feature. If None,
+        the vector is read as points if all its features are.
+    """
+
+    def __init__(self, raster_path, vector_path=None, in_memory=True,
+                 tile_size=256, block_aligned=True, nodata=None,
+                 workers=None, categorical=False, overlap=False,
+                 mask_cache=None, suffixes=None, reproject='vector',
+                 band_list=None, resolution=None, coords=False,
+                 memory_budget=None, prefetch=0, windows=None,
+                 window_size=None, points=None):
+        # A list of rasters on the same grid is read as one stack of bands.
+        if isinstance(raster_path, (list, tuple)):
+            self.raster_paths = list(raster_path)
+        else:
+            self.raster_paths = [raster_path]
+        self.raster_path = self.raster_paths[0]
+        self.nodata = nodata
+        self.workers = workers
+        self.prefetch = prefetch
+        self.categorical = categorical
+        self.band_list = None if band_list is None else list(band_list)
+        self.resolution = resolution
+        self.coords = coords
+
+        # Placeholders for the vector and possible temporary files.
+        self.vector_mask = self.pairs = self.attributes = None
+        self.mask_vector = self.overlap_vector = self.feature_bounds = None
+        self.mask_offset = (0, 0)
+        self.in_memory = in_memory
+        self.mask_cache = mask_cache
+        self.temp_dir = None
+        self.vsimem_paths = []
+
+        # Get raster band names. The first raster defines the grid.
+        self.rasters = [util.open_raster(path) for path in self.raster_paths]
+        self.ras = self.rasters[0]
+        for ras in self.rasters[1:]:
+            util.check_same_grid(self.ras, ras)
+        for ras in self.rasters:
+            if self.band_list is not None and not all(
+                    1 <= b <= ras.RasterCount for b in self.band_list):
+                raise ValueError(
+                    'Bands {} not in raster with {} bands.'.format(
+                        self.band_list, ras.RasterCount))
+        self.band_names = self._get_band_names(suffixes)
+
+        # No data values and mask bands.
+        if nodata is not None:
+            self.nodata_values = [
+                value for ras in self.rasters
+                for value in self._select_bands(util.get_nodata_values(ras))]
+            self.read_mask_bands = any(
+                util.has_mask_band(ras) for ras in self.rasters)
+
+        # Create a mask from the pixels touched by the vector.
+        bounds = None
+        if vector_path is not None:
+            try:
+                bounds = self._open_vector(
+                    vector_path, overlap, reproject, points)
+            except Exception:
+                self.close()
+                raise
+
+        if (self.pairs is not None or self.overlap_vector is not None) and \
+                resolution is not None:
+            self.close()
+            raise ValueError(
+                'resolution is not supported for points or overlap.')
+
+        # Points are read one native block at a time.
+        if self.pairs is not None:
+            tile_size, block_aligned, memory_budget = 1, True, None
+
+        # The budget is shared by the stacked rasters, and a window read at a
+        # reduced resolution only takes a part of it.
+        if memory_budget is not None:
+            memory_budget = memory_budget // len(self.rasters)
+            memory_budget *= (resolution or 1) ** 2
+
+        # Windows of the raster, also used for the vector mask. With a vector,
+        # only windows touched by a feature's bounding box are read.
+        window_kwargs = dict(
+            size=tile_size, block_aligned=block_aligned,
+            memory_budget=memory_budget, band_list=self.band_list)
+        if window_size is None:
+            window_size = tiling.window_size(self.ras, **window_kwargs)
+        self.window_size = tuple(window_size)
+        if windows is None:
+            windows = tiling.windows(self.ras, bounds=bounds, **window_kwargs)
+        self.windows = list(windows)
+        log.info('Reading %d windows of %dx%d pixels', len(self.windows),
+                 self.window_size[0], self.window_size[1])
+
+        if self.pairs is not None:
+            self._group_pairs()
+        if self.overlap_vector is not None:
+            self.feature_index = tiling.bounds_index(
+                self.ras, self.window_size, self.feature_bounds)
+
+    def _select_bands(self, values):
+        """Select the values of the bands in ``band_list``."""
+        if self.band_list is None:
+            return values
+        return [values[b - 1] for b in self.band_list]
+
+    def _get_band_names(self, suffixes):
+        """Band names of the raster, suffixed for a stack of rasters."""
+        if len(self.rasters) == 1:
+            return self._select_bands(util.get_raster_band_names(self.ras))
+
+        if suffixes is None:
+            suffixes = [os.path.splitext(os.path.basename(path))[0]
+                        for path in self.raster_paths]
+            if len(set(suffixes)) != len(suffixes):
+                raise ValueError(
+                    'Raster file names are not unique, give suffixes.')
+        elif len(suffixes) != len(self.rasters):
+            raise ValueError('Expected {} suffixes, got {}.'.format(
+                len(self.rasters), len(suffixes)))
+
+        return ['{}_{}'.format(name, suffix)
+                for ras, suffix in zip(self.rasters, suffixes)
+                for name in self._select_bands(
+                    util.get_raster_band_names(ras))]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """Remove temporary files."""
+        self.vector_mask = None
+        if self.temp_dir is not None:
+            shutil.rmtree(self.temp_dir, ignore_errors=True)
+            self.temp_dir = None
+        for path in self.vsimem_paths:
+            gdal.Unlink(path)
+        self.vsimem_paths = []
+
+    def _temp_path(self, ext):
+        """Path of a new temporary file, removed on close."""
+        if self.temp_dir is None:
+            self.temp_dir = tempfile.mkdtemp()
+        return os.path.join(self.temp_dir, '{}{}'.format(uuid.uuid1(), ext))
+
+    def _vsimem_path(self, ext):
+        """Path of a new file in GDAL's in-memory file system, removed on
+        close.
+        """
+        path = '/vsimem/{}{}'.format(uuid.uuid1(), ext)
+        self.vsimem_paths.append(path)
+        return path
+
+    def _warp_rasters(self, epsg):
+        """Replace the rasters with VRTs warped to another EPSG. The warped
+        rasters are still on one grid, so the stack stays aligned.
+        """
+        raster_paths = []
+        for path in self.raster_paths:
+            vrt_path = self._temp_path('.vrt')
+            util.warp_raster(path, epsg, vrt_path)
+            raster_paths.append(vrt_path)
+
+        self.raster_paths = raster_paths
+        self.raster_path = raster_paths[0]
+        self.rasters = [util.open_raster(path) for path in raster_paths]
+        self.ras = self.rasters[0]
+
+    def _open_vector(self, vector_path, overlap, reproject, points=None):
+        """Open a vector to burn into a mask of the raster, to rasterize
+        feature by feature for overlapping features, or find the pixel and
+        feature ID pairs of a point vector.
+
+        Returns
+        -------
+        np.ndarray
+            Pixel bounds of the vector features.
+        """
+        # Add a dummy feature ID column to the vector.
+        # This is not always present in OGR features.
+        vec_gdf = util.open_vector(vector_path, with_geopandas=True)
+        vec_gdf['__fid__'] = np.arange(1, len(vec_gdf) + 1)
+
+        # Bring the raster and vector to the same EPSG.
+        if reproject not in ('vector', 'raster', None):
+            raise ValueError('Unknown reproject: {}'.format(reproject))
+        if not util.same_epsg(self.ras, vec_gdf):
+            if reproject == 'vector':
+                vec_gdf = util.reproject_vector(vec_gdf, self.ras)
+            elif reproject == 'raster':
+                self._warp_rasters(util.get_epsg(vec_gdf))
+            util.check_same_epsg(self.ras, vec_gdf)
+
+        self.feature_bounds = util.get_pixel_bounds(
+            vec_gdf, self.ras.GetGeoTransform())
+
+        if points is None:
+            points = util.is_point_vector(vec_gdf)
+
+        if points:
+            # Points are located directly, one pixel per point. No mask.
+            cols, rows, index = util.get_point_pixels(vec_gdf, self.ras)
+            self.pairs = (cols, rows, (index + 1).astype(np.int32))
+
+        elif overlap:
+            # Features are rasterized on their own, a window at a time, so
+            # overlapping features all keep their pixels.
+            self.overlap_vector = vec_gdf
+
+        else:
+            # The mask is burned when first read, once the windows are known.
+            self.mask_vector = vec_gdf
+
+        # Vector attributes to join to the pixels, without the geometry. Row
+        # N holds the attributes of feature ID N + 1.
+        self.attributes = pd.DataFrame(vec_gdf.drop(
+            columns=['geometry', '__fid__'], errors='ignore'))
+        if self.categorical:
+            for col in self.attributes.columns:
+                if not is_numeric_dtype(self.attributes[col]):
+                    self.attributes[col] = \
+                        self.attributes[col].astype('category')
+        self._rename_attributes()
+
+        return self.feature_bounds
+
+    def _rename_attributes(self):
+        """Suffix the vector attributes named as a band, or as a coordinate
+        column with ``coords``, with ``_vector``, so they do not replace the
+        pixel values.
+        """
+        reserved = set(self.band_names)
+        if self.coords:
+            reserved.update(['row', 'col', 'x', 'y'])
+        names = set(self.attributes.columns)
+        renames = {}
+        for col in self.attributes.columns:
+            if col not in reserved:
+                continue
+            new_col = '{}_vector'.format(col)
+            while new_col in reserved or new_col in names:
+                new_col = '{}_vector'.format(new_col)
+            names.add(new_col)
+            renames[col] = new_col
+            log.warning('Vector attribute %s renamed to %s', col, new_col)
+        self.attributes = self.attributes.rename(columns=renames)
+
+    def _burn_mask(self):
+        """Burn the feature IDs of the vector into a mask of the raster.
+
+        A mask in memory only covers the extent of the windows read, its
+        offset in the raster is kept in ``mask_offset``. It is a compressed
+        GeoTIFF, so a scene sized mask is never held uncompressed.
+        """
+        if self.mask_cache is not None:
+            # Reuse the mask of the same vector on the same grid.
+            mask_cache = self.mask_cache
+            if not isinstance(mask_cache, MaskCache):
+                mask_cache = MaskCache(mask_cache)
+            return mask_cache.get_mask(self.raster_path, self.mask_vector)
+
+        if not self.in_memory:
+            # Create a temporary file for the mask. The raster may be a VRT,
+            # which can not be created, so always write a GeoTIFF.
+            return util.burn_vector_mask_into_raster(
+                self.raster_path, self.mask_vector, self._temp_path('.tif'),
+                vector_field='__fid__', dtype=gdal.GDT_Int32,
+                driver_name='GTiff')
+
+        # Extent of the windows, as a virtual subset of the raster.
+        xoff = min(window[2] for window in self.windows)
+        yoff = min(window[3] for window in self.windows)
+        xend = max(window[0] + window[2] for window in self.windows)
+        yend = max(window[1] + window[3] for window in self.windows)
+        template = gdal.Translate(
+            '', self.ras, format='VRT',
+            srcWin=[xoff, yoff, xend - xoff, yend - yoff])
+
+        self.mask_offset = (xoff, yoff)
+        return util.burn_vector_mask_into_raster(
+            template, self.mask_vector, self._vsimem_path('.tif'),
+            vector_field='__fid__', dtype=gdal.GDT_Int32,
+            driver_name='GTiff', creation_options=[
+                'TILED=YES', 'COMPRESS=DEFLATE', 'BIGTIFF=IF_SAFER'])
+
+    def _read_mask(self, window):
+        """Read a window of the vector mask, burning it if not yet done."""
+        if self.vector_mask is None:
+            self.vector_mask = self._burn_mask()
+
+        xsize, ysize, xoff, yoff = window
+        return tiling.read_window(
+            self.vector_mask, (xsize, ysize, xoff - self.mask_offset[0],
+                               yoff - self.mask_offset[1]),
+            resolution=self.resolution)
+
+    def _group_pairs(self):
+        """Group the pixel and feature ID pairs by the window they are in,
+        ordered by FID within a window. Pairs outside the windows read are
+        dropped.
+        """
+        cols, rows, fids = self.pairs
+        size_x, size_y = self.window_size
+        num_win_x = -(-self.ras.RasterXSize // size_x)
+
+        keys = (rows // size_y) * num_win_x + cols // size_x
+        order = np.lexsort((fids, keys))
+        keys = keys[order]
+
+        # Slice of the sorted pairs in each window.
+        win_keys = np.array([(yoff // size_y) * num_win_x + xoff // size_x
+                             for _, _, xoff, yoff in self.windows],
+                            dtype=np.int64)
+        starts = np.searchsorted(keys, win_keys, side='left')
+        ends = np.searchsorted(keys, win_keys, side='right')
+
+        # Keep only the pairs of the windows, in the order of the windows.
+        kept = np.concatenate(
+            [order[start:end] for start, end in zip(starts, ends)] +
+            [np.empty(0, dtype=order.dtype)])
+        sizes = ends - starts
+        ends = np.cumsum(sizes)
+        starts = ends - sizes
+
+        self.pairs = (cols[kept], rows[kept], fids[kept])
+        self.pair_slices = list(zip(starts, ends))
+
+    def _feature_pixels(self, window):
+        """Rasterize the features whose bounding box touches a window, each
+        on its own.
+
+        Returns
+        -------
+        tuple[np.ndarray]
+            Column and row in the raster and feature ID of each pixel and
+            feature pair in the window, ordered by FID.
+        """
+        # Threads can not share the dataset handles.
+        ras = self.ras if self.workers is None \
+            else util.open_thread_raster(self.raster_path)
+
+        touched = tiling.touched_bounds(self.feature_index, [window])
+        cols, rows, index = util.get_feature_pixels(
+            self.overlap_vector.iloc[touched], ras, window=window)
+        return cols, rows, (touched[index] + 1).astype(np.int32)
+
+    def _window_pairs(self):
+        """Generator of the pixel and feature ID pairs of a point vector in
+        each window. None for each window unless the vector is points.
+        """
+        if self.pairs is not None:
+            for start, end in self.pair_slices:
+                yield tuple(arr[start:end] for arr in self.pairs)
+        else:
+            for _ in self.windows:
+                yield None
+
+    def count(self):
+        """Count the pixels to extract, before no data pixels are dropped.
+
+        Returns
+        -------
+        int or None
+            None with ``overlap``, where the pixels are only known once the
+            features are rasterized.
+        """
+        if self.pairs is not None:
+            return int(sum(end - start for start, end in self.pair_slices))
+        if self.overlap_vector is not None:
+            return None
+        if self.mask_vector is None:
+            return sum(np.prod(tiling.buffer_size(w, self.resolution))
+                       for w in self.windows)
+
+        return sum(np.count_nonzero(self._read_mask(w)) for w in self.windows)
+
+    def _read_window(self, window, mask=False):
+        """Read a window of the raster, or of the GDAL mask bands, stacking
+        the bands of all rasters.
+        """
+        read = tiling.read_mask_window if mask else tiling.read_window
+
+        # Threads can not share the dataset handles.
+        if self.workers is None and not self.prefetch:
+            rasters = self.rasters
+        else:
+            rasters = [util.open_thread_raster(path)
+                       for path in self.raster_paths]
+
+        kwargs = dict(band_list=self.band_list, resolution=self.resolution)
+        if len(rasters) == 1:
+            return read(rasters[0], window, **kwargs)
+        arrs = (read(ras, window, **kwargs) for ras in rasters)
+        return np.concatenate(
+            [arr if arr.ndim == 3 else arr[np.newaxis] for arr in arrs])
+
+    def _pixel_index(self, window, rows, cols):
+        """Convert row and column indices in a window array to the raster.
+
+        At a reduced resolution the index of the raster pixel at the centre of
+        each read pixel is returned.
+        """
+        if not self.coords:
+            return None
+
+        xsize, ysize, xoff, yoff = window
+        if self.resolution is not None:
+            buf_xsize, buf_ysize = tiling.buffer_size(window, self.resolution)
+            rows = ((rows + 0.5) * (ysize / buf_ysize)).astype(np.intp)
+            cols = ((cols + 0.5) * (xsize / buf_xsize)).astype(np.intp)
+        return ((rows + yoff).astype(np.int32, copy=False),
+                (cols + xoff).astype(np.int32, copy=False))
+
+    def _read(self, window):
+        """Read the raster window and, if needed for no data, its GDAL mask
+        bands.
+        """
+        ras_arr = self._read_window(window)
+        mask_arr = None
+        if self.nodata is not None and self.read_mask_bands:
+            mask_arr = self._read_window(window, mask=True)
+        return ras_arr, mask_arr
+
+    def _extract(self, window, fid_arr, pairs=None, arrays=None):
+        """Extract the pixels of a raster window.
+
+        Parameters
+        ----------
+        pairs : tuple[np.ndarray] or None
+            Pixel and feature ID pairs in the window, see
+            :meth:`_window_pairs`. With ``overlap`` the features are
+            rasterized here, in the worker thread.
+        arrays : tuple[np.ndarray] or None
+            Raster and mask band arrays of the window if already read, see
+            :meth:`_read`.
+
+        Returns
+        -------
+        tuple
+            Pixels in the form [band][pixel], their feature ID (None without
+            a vector) and their row and column in the raster (None unless
+            ``coords``).
+        """
+        ras_arr, mask_arr = self._read(window) if arrays is None else arrays
+
+        # Drop or convert no data pixels.
+        if self.nodata is not None:
+            valid = util.get_valid_pixels(
+                ras_arr, self.nodata_values, mask=mask_arr)
+            ras_arr, keep = util.apply_nodata_policy(
+                ras_arr, valid, nodata=self.nodata)
+        else:
+            keep = None
+
+        if self.overlap_vector is not None:
+            pairs = self._feature_pixels(window)
+
+        if pairs is not None:
+            # Pairs in the window, in window pixel coordinates.
+            cols, rows, fid_px = pairs
+            rows = rows - window[3]
+            cols = cols - window[2]
+            if keep is not None:
+                kept = keep[rows, cols]
+                rows, cols, fid_px = rows[kept], cols[kept], fid_px[kept]
+
+            pixels = (ras_arr[rows, cols] if ras_arr.ndim == 2
+                      else ras_arr[:, rows, cols])
+            return (pixels.reshape((len(self.band_names), -1)), fid_px,
+                    self._pixel_index(window, rows, cols))
+
+        if fid_arr is not None:
+            if keep is not None:
+                fid_arr = np.where(keep, fid_arr, 0)
+
+            # Extract only masked pixels, grouped by their FID.
+            pixels, fid_px, (rows, cols) = util.get_pixels_by_mask(
+                ras_arr, fid_arr, return_index=True)
+            return (pixels.reshape((len(self.band_names), -1)), fid_px,
+                    self._pixel_index(window, rows, cols))
+
+        # No vector given, simply load the raster.
+        if keep is None:
+            # Every pixel is kept, so [band][y][x] is viewed as
+            # [band][pixel] without selecting (or copying) any pixels.
+            pixels = ras_arr.reshape((len(self.band_names), -1))
+            index = None
+            if self.coords:
+                rows, cols = np.divmod(
+                    np.arange(pixels.shape[1]), ras_arr.shape[-1])
+                index = self._pixel_index(window, rows, cols)
+            return pixels, None, index
+
+        pixels, (rows, cols) = util.get_pixels(
+            ras_arr, keep, return_index=True)
+        return (pixels.reshape((len(self.band_names), -1)), None,
+                self._pixel_index(window, rows, cols))
+
+    def tiles(self):
+        """Generator of the pixels of each window.
+
+        Yields
+        ------
+        tuple
+            Pixels in the form [band][pixel], their feature ID (None without
+            a vector) and their row and column in the raster (None unless
+            ``coords``).
+        """
+        # The vector mask is read in this thread, the raster is read (and
+        # overlapping features rasterized) by the workers.
+        if self.mask_vector is not None:
+            fid_tiles = (self._read_mask(window) for window in self.windows)
+        else:
+            fid_tiles = itertools.repeat(None)
+        tasks = zip(self.windows, fid_tiles, self._window_pairs())
+
+        if self.workers is None and self.prefetch:
+            # Read ahead on background threads, extract in this thread.
+            with ThreadPoolExecutor(max_workers=self.prefetch) as executor:
+                reads = tiling.ordered_map(
+                    self._read, ((window, ) for window in self.windows),
+                    executor=executor, depth=self.prefetch + 1)
+                for task, arrays in zip(tasks, reads):
+                    yield self._extract(*task, arrays=arrays)
+        elif self.workers is None:
+            for tile in tiling.ordered_map(self._extract, tasks):
+                yield tile
+        else:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                for tile in tiling.ordered_map(
+                        self._extract, tasks, executor=executor,
+                        depth=2 * self.workers):
+                    yield tile
+
+    def pixel_dtype(self):
+        """Get the data type of the extracted pixels.
+
+        Returns
+        -------
+        np.dtype
+            Data type of the stacked bands, as read from the rasters and
+            after any no data conversion.
+        """
+        band = self.band_list[0] if self.band_list is not None else 1
+        dtype = np.result_type(*[
+            gdal_array.GDALTypeCodeToNumericTypeCode(
+                ras.GetRasterBand(band).DataType)
+            for ras in self.rasters])
+        if self.nodata == 'nan':
+            dtype = np.result_type(dtype, np.float32)
+        return dtype
+
+    def to_dataframe(self, pixels, fid_px=None, index=None):
+        """Create a DataFrame of pixels, joined with the vector attributes.
+
+        Parameters
+        ----------
+        pixels : np.ndarray
+            Pixels in the form [band][pixel].
+        fid_px : np.ndarray or None
+            Feature ID of each pixel.
+        index : tuple[np.ndarray] or None
+            Row and column of each pixel in the raster.
+
+        Returns
+        -------
+        pandas.core.frame.DataFrame
+        """
+        if fid_px is None and index is None:
+            return pd.DataFrame(pixels.transpose(), columns=self.band_names,
+                                copy=False)
+
+        # Pixel position and the map coordinates of the pixel centre.
+        columns = collections.OrderedDict()
+        if index is not None:
+            rows, cols = index
+            x, y = util.pixel_to_geo(
+                self.ras.GetGeoTransform(), cols + 0.5, rows + 0.5)
+            columns.update([('row', rows), ('col', cols), ('x', x), ('y', y)])
+        columns.update(zip(self.band_names, pixels))
+        if fid_px is None:
+            return pd.DataFrame(columns)
+
+        # Join with pixels with vector attributes using the FID. As the FID
+        # is the (1 indexed) row of the attributes this is a positional
+        # take rather than a hash join.
+        rows = fid_px.astype(np.intp) - 1
+        for col in self.attributes.columns:
+            columns[col] = self.attributes[col].values.take(rows)
+        return pd.DataFrame(columns)
+
+    def empty_dataframe(self):
+        """Create an empty DataFrame with the columns and data types of the
+        extracted pixels.
+
+        Returns
+        -------
+        pandas.core.frame.DataFrame
+        """
+        empty_index = np.empty(0, dtype=np.int32)
+        return self.to_dataframe(
+            np.empty((len(self.band_names), 0), dtype=self.pixel_dtype()),
+            None if self.attributes is None else empty_index,
+            (empty_index, empty_index) if self.coords else None)
+
+
+def _read_dataframe(raster_pixels):
+    """Read all windows of a :class:`_RasterPixels` into one DataFrame."""
+    # Upper bound of the number of pixels, no data may be dropped.
+    num_pixels = raster_pixels.count()
+    num_bands = len(raster_pixels.band_names)
+
+    # Overlapping features are only counted by rasterizing them, so the tiles
+    # are kept and concatenated once instead.
+    if num_pixels is None:
+        tiles = list(raster_pixels.tiles())
+        if not tiles:
+            return raster_pixels.empty_dataframe()
+        pixels, fid_px, index = zip(*tiles)
+        return raster_pixels.to_dataframe(
+            np.concatenate(pixels, axis=1), np.concatenate(fid_px),
+            None if index[0] is None
+            else tuple(np.concatenate(arrs) for arrs in zip(*index)))
+
+    band_buf = fid_buf = None
+    index_buf = np.empty((2, num_pixels), dtype=np.int32) \
+        if raster_pixels.coords else None
+    pos = 0
+    for pixels, fid_px, index in raster_pixels.tiles():
+
+        # Allocate on the first tile, when the data type is known.
+        if band_buf is None:
+            band_buf = np.empty((num_bands, num_pixels),
+                                dtype=pixels.dtype)
+            if fid_px is not None:
+                fid_buf = np.empty(num_pixels, dtype=fid_px.dtype)
+
+        end = pos + pixels.shape[1]
+        band_buf[:, pos:end] = pixels
+        if fid_buf is not None:
+            fid_buf[pos:end] = fid_px
+        if index_buf is not None:
+            index_buf[:, pos:end] = index
+        pos = end
+
+    # No tiles were read, no pixels touched by the vector.
+    if band_buf is None:
+        return raster_pixels.empty_dataframe()
+
+    return raster_pixels.to_dataframe(
+        band_buf[:, :pos],
+        None if fid_buf is None else fid_buf[:pos],
+        None if index_buf is None else index_buf[:, :pos])
+
+
+def raster_to_dataframe(raster_path, vector_path=None, **kwargs):
     """Convert a raster to a Pandas DataFrame.
 
+    The pixels are counted first, then copied from each tile into
+    preallocated arrays so the DataFrame is only built once.
+
     Parameters
     ----------
-    raster_path : str
-        Path to raster file.
+    raster_path : str or list of str
+        Path to raster file, or paths to rasters on the same grid whose bands
+        are stacked side by side.
     vector_path : str
         Optional path to vector file. If given, raster pixels will be extracted
         from features in the vector. If None, all raster pixels are converted
         to a DataFrame.
+    **kwargs
+        Other options, see :func:`iter_raster_to_dataframe`.
 
     Returns
     -------
     pandas.core.frame.DataFrame
     """
-    # Placeholders for possible temporary files.
-    temp_dir = vector_mask_fname = None
+    with _RasterPixels(raster_path, vector_path=vector_path,
+                       **kwargs) as raster_pixels:
+        return _read_dataframe(raster_pixels)
 
-    # Get raster band names.
-    ras = util.open_raster(raster_path)
-    raster_band_names = util.get_raster_band_names(ras)
 
-    # Create a mask from the pixels touched by the vector.
-    if vector_path is not None:
+def iter_raster_to_dataframe(raster_path, vector_path=None, in_memory=True,
+                             tile_size=256, block_aligned=True, nodata=None,
+                             workers=None, categorical=False, overlap=False,
+                             mask_cache=None, suffixes=None,
+                             reproject='vector', band_list=None,
+                             resolution=None, coords=False,
+                             memory_budget=None, prefetch=0):
+    """Convert a raster to Pandas DataFrames, one for each tile of the raster.
 
-        # Create a temporary directory for files.
-        temp_dir = tempfile.mkdtemp()
-        vec_with_fid = os.path.join(temp_dir, '{}'.format(uuid.uuid1()))
+    Unlike :func:`raster_to_dataframe` the tiles are never concatenated, so
+    rasters larger than memory can be processed a tile at a time.
 
-        # Add a dummy feature ID column to the vector.
-        # This is not always present in OGR features.
-        vec_gdf = util.open_vector(vector_path, with_geopandas=True)
-        mask_values = list(range(1, len(vec_gdf) + 1))
-        vec_gdf['__fid__'] = pd.Series(mask_values)
-        vec_gdf.to_file(vec_with_fid, driver='GeoJSON')
+    Parameters
+    ----------
+    raster_path : str or list of str
+        Path to raster file, or paths to rasters on the same grid whose bands
+        are stacked side by side.
+    vector_path : str
+        Optional path to vector file. If given, raster pixels will be extracted
+        from features in the vector. If None, all raster pixels are converted
+        to a DataFrame. Vector attributes with the same name as a band, or as
+        a column added by ``coords``, are suffixed with ``_vector``.
+    in_memory : bool
+        If True (default), the vector mask (Int32 feature IDs over the extent
+        of the tiles touched by the vector) is rasterized into a tiled,
+        DEFLATE compressed GeoTIFF in GDAL's in-memory file system. Its size
+        in memory is the compressed size, small for masks of mostly empty
+        pixels or large features, up to 4 bytes per pixel for many features
+        of a few pixels each. Set to False to write the mask to a temporary
+        file instead.
+    tile_size : int
+        Size in pixels of the tiles the raster is read in. Each DataFrame
+        has at most ``tile_size * tile_size`` rows, or about that many if
+        ``block_aligned``.
+    block_aligned : bool
+        If True (default), tiles are adjusted to be made of whole blocks of
+        the raster so each block is only read once.
+    nodata : str or None
+        How to handle no data pixels, from the band no data values and GDAL
+        mask bands. 'any' drops a pixel if any band is no data, 'all' drops a
+        pixel only if all bands are no data and 'nan' converts no data values
+        to NaN. If None (default), no data pixels are kept as they are.
+    workers : int or None
+        Number of threads to extract tiles with. Each thread reads the raster
+        with its own dataset handle. Tiles are yielded in the same order as
+        without workers. If None (default), tiles are extracted in the calling
+        thread.
+    categorical : bool
+        If True, non-numeric vector attributes are returned as categorical
+        (dictionary encoded) columns, sharing categories across all tiles.
+    overlap : bool
+        If True, pixels touched by more than one (overlapping) feature are
+        returned once for every feature, each feature being rasterized on its
+        own in every tile its bounding box touches, so only the pixels of one
+        tile are held at a time. Otherwise (default) features are burned into
+        a single mask where only the last overlapping feature is kept. Each
+        raster window is read once either way.
+    mask_cache : str or MaskCache or None
+        Directory of (or a) ``MaskCache`` to keep the burned vector mask in.
+        Rasters on the same grid as a previous call with the same vector reuse
+        its mask instead of burning it again. Not used for point vectors or
+        with ``overlap``.
+    suffixes : list of str or None
+        Suffix of the band names of each raster, e.g. ``Band_1_<suffix>``,
+        when ``raster_path`` is a list. If None, the raster file names without
+        extension are used.
+    reproject : str or None
+        How to handle a vector with a different EPSG to the raster. 'vector'
+        (default) transforms the vector to the raster EPSG in memory. 'raster'
+        warps the raster to the vector EPSG on the fly through a VRT, so
+        pixels are resampled (nearest neighbour) when read. If None, an error
+        is raised.
+    band_list : list of int or None
+        Band numbers (1-based) to read, e.g. ``[3, 2, 1]``. Only these bands
+        are read and decoded. If None (default), all bands are read.
+    resolution : int or None
+        Factor to reduce the resolution by, e.g. 4 returns one pixel for every
+        4x4 pixels of the raster (and of the vector mask). The raster's
+        overviews are read where they exist, otherwise pixels are subsampled
+        (nearest neighbour). Not supported for point vectors or with
+        ``overlap``. If None (default), the full resolution is read.
+    coords : bool
+        If True, add the columns ``row`` and ``col`` (int32) with the position
+        of each pixel in the raster and ``x`` and ``y`` (float64) with the map
+        coordinates of the pixel centre. Computed from the indices of the
+        extracted pixels, for all pixels of a tile at once.
+    memory_budget : int or None
+        Maximum size in bytes of the raster pixels read for a tile. If given,
+        ``tile_size`` is ignored and tiles are sized from the number of bands,
+        their data types and block sizes: full width strips of as many rows
+        as fit, or part of a row for very large rasters. The chosen tiling is
+        logged. Not used for point vectors, which are read one block at a
+        time.
+    prefetch : int
+        Number of tiles to read ahead on background threads, each with its own
+        dataset handle, so reading and decompressing the next tiles overlaps
+        with extracting the current one. Not used with ``workers``, which
+        already read in parallel. If 0 (default), tiles are read when needed.
+
+    Yields
+    ------
+    pandas.core.frame.DataFrame
+        Pixels of a single tile. Tiles with no pixels yield an empty
+        DataFrame. With a vector, tiles outside the bounding boxes of all
+        features are skipped.
+    """
+    with _RasterPixels(
+            raster_path, vector_path=vector_path, in_memory=in_memory,
+            tile_size=tile_size, block_aligned=block_aligned, nodata=nodata,
+            workers=workers, categorical=categorical,
+            overlap=overlap, mask_cache=mask_cache,
+            suffixes=suffixes, reproject=reproject, band_list=band_list,
+            resolution=resolution, coords=coords,
+            memory_budget=memory_budget, prefetch=prefetch) as raster_pixels:
+        for pixels, fid_px, index in raster_pixels.tiles():
+            yield raster_pixels.to_dataframe(pixels, fid_px, index)
 
-        # Mask the vector using the feature ID column.
-        vector_mask_fname = os.path.join(temp_dir, '{}'.format(uuid.uuid1()))
-        vector_mask = util.burn_vector_mask_into_raster(
-            raster_path, vec_with_fid, vector_mask_fname,
-            vector_field='__fid__')
 
-        # Loop over mask values to extract pixels.
-        tile_dfs = []  # DataFrames of each tile.
-        mask_arr = vector_mask.GetRasterBand(1).ReadAsArray()
+def sample_raster_to_dataframe(raster_path, vector_path=None, max_pixels=None,
+                               fraction=None, stratify_by=None, seed=None,
+                               **kwargs):
+    """Convert a random sample of raster pixels to a Pandas DataFrame.
 
-        for ras_arr in tiling.tiles(ras):
+    Pixels are sampled a tile at a time, so the full set of pixels is never
+    built. With ``max_pixels`` each pixel gets a random key and the
+    ``max_pixels`` lowest keys of each feature (or stratum) are tracked across
+    tiles, using ``8 * max_pixels`` bytes per feature (or stratum). A pixel is
+    only kept while its key is among the lowest, so each pixel has the same
+    chance of being in the final sample and only the features in a tile are
+    updated when it is read.
 
-            mask_dfs = []  # DataFrames of each mask.
-            for mask_val in mask_values:
+    Parameters
+    ----------
+    raster_path : str or list of str
+        Path to raster file, or paths to rasters on the same grid whose bands
+        are stacked side by side.
+    vector_path : str
+        Optional path to vector file. If given, raster pixels will be sampled
+        from each feature in the vector. If None, pixels are sampled from the
+        whole raster.
+    max_pixels : int or None
+        Maximum number of pixels to sample from each feature, or from each
+        value of ``stratify_by``, or from the whole raster without a vector.
+    fraction : float or None
+        Fraction (0 - 1) of pixels to sample. If used with ``max_pixels``, the
+        fraction is sampled before the maximum is applied.
+    stratify_by : str or None
+        Name of a vector attribute. If given, ``max_pixels`` is applied to
+        the pixels of all features with the same value of the attribute,
+        rather than to each feature.
+    seed : int or None
+        Seed of the random number generator, for reproducible samples.
+    **kwargs
+        Other options, see :func:`iter_raster_to_dataframe`.
 
-                # Extract only masked pixels.
-                pixels = util.get_pixels(
-                    ras_arr, mask_arr, mask_val=mask_val)\
-                    .transpose()
-                fid_px = np.ones(pixels.shape[0]) * mask_val
+    Returns
+    -------
+    pandas.core.frame.DataFrame
+        Sampled pixels in the order they are in the raster.
+    """
+    if max_pixels is None and fraction is None:
+        raise ValueError('One of max_pixels or fraction is required.')
+    if stratify_by is not None and vector_path is None:
+        raise ValueError('stratify_by requires a vector.')
 
-                # Create a DataFrame of masked pixels and their FID.
-                mask_df = pd.DataFrame(pixels, columns=raster_band_names)
-                mask_df['__fid__'] = fid_px
-                mask_dfs.append(mask_df)
+    random_state = np.random.RandomState(seed)
 
-            # Concat the mask DataFrames.
-            mask_df = pd.concat(mask_dfs)
+    with _RasterPixels(raster_path, vector_path=vector_path,
+                       **kwargs) as raster_pixels:
 
-            # Join with pixels with vector attributes using the FID.
-            tile_dfs.append(mask_df.merge(vec_gdf, how='left', on='__fid__'))
+        # Group (stratum) of each FID, the FID itself if not stratified.
+        if raster_pixels.attributes is None:
+            groups = np.zeros(1, dtype=np.intp)
+        elif stratify_by is None:
+            groups = np.arange(len(raster_pixels.attributes) + 1)
+        else:
+            codes = pd.factorize(raster_pixels.attributes[stratify_by])[0]
+            groups = np.concatenate(([-1], codes)) + 1
 
-        # Merge all the tiles.
-        out_df = pd.concat(tile_dfs)
+        # Lowest keys of each group so far, sorted. The last is the highest
+        # key a pixel of the group can have to be in the sample.
+        if max_pixels is not None:
+            best_keys = np.full((groups.max() + 1, max_pixels), np.inf)
 
-    else:
-        # No vector given, simply load the raster.
-        tile_dfs = []  # DataFrames of each tile.
-        for ras_arr in tiling.tiles(ras):
+        # Candidate pixels of each tile, their FID, random key and row and
+        # column (empty unless coords).
+        tile_samples = []
+        for pixels, fid_px, index in raster_pixels.tiles():
+            num_pixels = pixels.shape[1]
+            if fid_px is None:
+                fid_px = np.zeros(num_pixels, dtype=np.int32)
+            index = np.empty((0, num_pixels), dtype=np.int32) \
+                if index is None else np.stack(index)
+            keys = random_state.random_sample(num_pixels)
+
+            # Bernoulli sample of the tile. Kept keys stay uniform, so can
+            # still be used for the lowest keys.
+            if fraction is not None:
+                selected = keys < fraction
+                pixels, fid_px = pixels[:, selected], fid_px[selected]
+                keys, index = keys[selected], index[:, selected]
+
+            if max_pixels is not None and len(keys):
+                # Merge the keys of the tile with the lowest keys of only the
+                # groups in the tile. Each group has max_pixels keys in
+                # best_keys, so its lowest keys start where it does.
+                tile_groups = groups[fid_px]
+                present = np.unique(tile_groups)
+                all_groups = np.concatenate(
+                    (np.repeat(present, max_pixels), tile_groups))
+                all_keys = np.concatenate(
+                    (best_keys[present].ravel(), keys))
+                ranked = np.lexsort((all_keys, all_groups))
+                starts = np.searchsorted(all_groups[ranked], present)
+                best_keys[present] = all_keys[ranked][
+                    starts[:, np.newaxis] + np.arange(max_pixels)]
+
+                # Keep the pixels among the lowest keys so far.
+                selected = keys <= best_keys[tile_groups, -1]
+                pixels, fid_px = pixels[:, selected], fid_px[selected]
+                keys, index = keys[selected], index[:, selected]
+
+            tile_samples.append((pixels, fid_px, keys, index))
+
+        if tile_samples:
+            pixels, fid_px, keys, index = (
+                np.concatenate(arrs, axis=-1) for arrs in zip(*tile_samples))
+        else:
+            pixels = np.empty((len(raster_pixels.band_names), 0),
+                              dtype=raster_pixels.pixel_dtype())
+            fid_px = np.empty(0, dtype=np.int32)
+            keys = np.empty(0)
+            index = np.empty((2 if raster_pixels.coords else 0, 0),
+                             dtype=np.int32)
+
+        # Drop the pixels whose key was later passed by max_pixels others.
+        # Candidates are kept in the order they were read, so the sample is
+        # too.
+        if max_pixels is not None:
+            selected = keys <= best_keys[groups[fid_px], -1]
+            pixels, fid_px, index = \
+                pixels[:, selected], fid_px[selected], index[:, selected]
+
+        return raster_pixels.to_dataframe(
+            pixels,
+            fid_px if raster_pixels.attributes is not None else None,
+            index if raster_pixels.coords else None)
+
+
+def zonal_stats(raster_path, vector_path, stats=None, bins=None,
+                hist_range=None, **kwargs):
+    """Compute statistics of the raster pixels of each vector feature.
+
+    Statistics are accumulated a tile at a time, so memory use is
+    proportional to the number of features rather than the number of pixels.
+    NaN pixel values (e.g. with ``nodata='nan'``) are ignored.
+
+    Parameters
+    ----------
+    raster_path : str or list of str
+        Path to raster file, or paths to rasters on the same grid whose bands
+        are stacked side by side.
+    vector_path : str
+        Path to vector file.
+    stats : list[str] or None
+        Statistics to compute for each band, any of 'count', 'sum', 'sumsq'
+        (sum of squares), 'mean', 'std', 'min' and 'max'. If None, all but
+        'sumsq' are computed.
+    bins : int or sequence of float or None
+        If given, a histogram of each band is also computed. Either the
+        number of equal width bins in ``hist_range`` or the bin edges.
+    hist_range : tuple[float] or None
+        Lower and upper range of the histogram bins, required if ``bins`` is
+        an int.
+    **kwargs
+        Other options, see :func:`iter_raster_to_dataframe`.
+
+    Returns
+    -------
+    pandas.core.frame.DataFrame
+        One row per feature (in the order of the vector) with a
+        ``<band>_<stat>`` column for each band and statistic, a
+        ``<band>_hist`` column of histogram counts if ``bins`` is given and
+        the vector attributes.
+    """
+    if stats is None:
+        stats = ['count', 'sum', 'mean', 'std', 'min', 'max']
+    unknown = set(stats) - {'count', 'sum', 'sumsq', 'mean', 'std', 'min',
+                            'max'}
+    if unknown:
+        raise ValueError('Unknown statistics: {}'.format(sorted(unknown)))
+
+    # Histogram bin edges.
+    edges = None
+    if bins is not None:
+        if np.ndim(bins) == 0:
+            if hist_range is None:
+                raise ValueError('hist_range is required for a number of '
+                                 'bins.')
+            edges = np.linspace(hist_range[0], hist_range[1], int(bins) + 1)
+        else:
+            edges = np.asarray(bins, dtype=np.float64)
+
+    with _RasterPixels(raster_path, vector_path=vector_path,
+                       **kwargs) as raster_pixels:
+
+        # Accumulators of shape [band][FID], FID 0 is unused.
+        num_bands = len(raster_pixels.band_names)
+        num_fids = len(raster_pixels.attributes) + 1
+        shape = (num_bands, num_fids)
+        count = np.zeros(shape, dtype=np.int64)
+        total = np.zeros(shape)
+        total_sq = np.zeros(shape)
+        minimum = np.full(shape, np.inf)
+        maximum = np.full(shape, -np.inf)
+        if edges is not None:
+            num_bins = len(edges) - 1
+            hist = np.zeros(shape + (num_bins, ), dtype=np.int64)
+
+        for pixels, fid_px, _ in raster_pixels.tiles():
+            if not fid_px.size:
+                continue
+
+            values = pixels.astype(np.float64)
+            valid = ~np.isnan(values)
+            zeroed = np.where(valid, values, 0)
+
+            # Index of each value in the flattened [band][FID] accumulators.
+            flat_idx = (np.arange(num_bands)[:, np.newaxis] * num_fids +
+                        fid_px[np.newaxis, :]).ravel()
+            size = num_bands * num_fids
+
+            count += np.bincount(
+                flat_idx[valid.ravel()], minlength=size).reshape(shape)
+            total += np.bincount(
+                flat_idx, weights=zeroed.ravel(), minlength=size)\
+                .reshape(shape)
+            total_sq += np.bincount(
+                flat_idx, weights=(zeroed * zeroed).ravel(),
+                minlength=size).reshape(shape)
+
+            # Pixels are grouped by FID, so min/max reduce over each group.
+            starts = np.concatenate(
+                ([0], np.flatnonzero(np.diff(fid_px)) + 1))
+            fids = fid_px[starts]
+            minimum[:, fids] = np.fmin(
+                minimum[:, fids], np.fmin.reduceat(values, starts, axis=1))
+            maximum[:, fids] = np.fmax(
+                maximum[:, fids], np.fmax.reduceat(values, starts, axis=1))
+
+            if edges is not None:
+                # Last bin includes the upper edge, as np.histogram.
+                bin_idx = np.searchsorted(edges, values, side='right') - 1
+                bin_idx[values == edges[-1]] = num_bins - 1
+                in_range = valid & (bin_idx >= 0) & (bin_idx < num_bins)
+                hist += np.bincount(
+                    flat_idx[in_range.ravel()] * num_bins +
+                    bin_idx[in_range], minlength=size * num_bins)\
+                    .reshape(hist.shape)
+
+        # Statistics of each feature, ignoring the unused FID 0.
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = total / count
+            std = np.sqrt(np.maximum(total_sq / count - mean * mean, 0))
+        empty = count == 0
+        minimum[empty] = maximum[empty] = np.nan
+
+        results = {'count': count, 'sum': total, 'sumsq': total_sq,
+                   'mean': mean, 'std': std, 'min': minimum,
+                   'max': maximum}
+
+        columns = collections.OrderedDict()
+        for i, band_name in enumerate(raster_pixels.band_names):
+            for stat in stats:
+                columns['{}_{}'.format(band_name, stat)] = \
+                    results[stat][i, 1:]
+            if edges is not None:
+                columns['{}_hist'.format(band_name)] = list(hist[i, 1:])
+
+        stats_df = pd.DataFrame(columns)
+        for col in raster_pixels.attributes.columns:
+            stats_df[col] = raster_pixels.attributes[col].values
+
+        return stats_df
+
+
+def _parquet_schema(raster_pixels):
+    """Get the Parquet schema of the pixels of a :class:`_RasterPixels`.
+
+    The types of the vector attributes are inferred from all features rather
+    than from a single tile, where a column may be all null.
+
+    Returns
+    -------
+    pyarrow.Schema
+    """
+    import pyarrow as pa
+
+    schema = pa.Schema.from_pandas(
+        raster_pixels.empty_dataframe(), preserve_index=False)
+    if raster_pixels.attributes is None:
+        return schema
+
+    attr_schema = pa.Schema.from_pandas(
+        raster_pixels.attributes, preserve_index=False)
+    return pa.schema(
+        [attr_schema.field(name) if name in attr_schema.names
+         else schema.field(name) for name in schema.names],
+        metadata=schema.metadata)
+
+
+def raster_to_parquet(raster_path, out_path, vector_path=None, **kwargs):
+    """Convert a raster to a Parquet file, written a tile at a time.
+
+    The pixels are never concatenated into a single DataFrame, each tile is
+    written as its own row group. The schema is known before any tile is
+    read, so a file with no rows still has the expected columns. Requires
+    ``pyarrow``.
+
+    Parameters
+    ----------
+    raster_path : str or list of str
+        Path to raster file, or paths to rasters on the same grid whose bands
+        are stacked side by side.
+    out_path : str
+        Path of the output Parquet file.
+    vector_path : str
+        Optional path to vector file. If given, raster pixels will be extracted
+        from features in the vector. If None, all raster pixels are converted.
+    **kwargs
+        Other options, see :func:`iter_raster_to_dataframe`. Each row group
+        has at most ``tile_size * tile_size`` rows.
+
+    Returns
+    -------
+    int
+        Number of rows written.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError('pyarrow is required to write Parquet files.')
+
+    num_rows = 0
+    with _RasterPixels(raster_path, vector_path=vector_path,
+                       **kwargs) as raster_pixels:
+        schema = _parquet_schema(raster_pixels)
+        writer = pq.ParquetWriter(out_path, schema)
+        try:
+            for pixels, fid_px, index in raster_pixels.tiles():
+
+                # Skip tiles without pixels, they would be empty row groups.
+                if not pixels.shape[1]:
+                    continue
+
+                tile_df = raster_pixels.to_dataframe(pixels, fid_px, index)
+                table = pa.Table.from_pandas(
+                    tile_df, schema=schema, preserve_index=False)
+                writer.write_table(table)
+                num_rows += table.num_rows
+        finally:
+            writer.close()
+
+    return num_rows
+
+
+def _dask_partition(raster_path, vector, features, windows, start,
+                    categories, kwargs):
+    """Read one partition of :func:`raster_to_dask_dataframe`."""
+    # Only the features touching the windows are rasterized.
+    if features is not None:
+        vector = vector.iloc[features]
+
+    with _RasterPixels(raster_path, vector_path=vector, windows=windows,
+                       **kwargs) as raster_pixels:
+        df = _read_dataframe(raster_pixels)
+
+    # Categories are those of all features, not only the partition's.
+    for col, dtype in categories.items():
+        df[col] = df[col].astype(dtype)
+
+    # Continue the index of the previous partitions.
+    if start is not None:
+        df.index = pd.RangeIndex(start, start + len(df))
+    return df
+
+
+def raster_to_dask_dataframe(raster_path, vector_path=None,
+                             windows_per_partition=1, **kwargs):
+    """Convert a raster to a lazy Dask DataFrame, partitioned by windows.
+
+    Nothing is read until the DataFrame is computed. Each partition opens
+    the raster itself and, with a vector, only rasterizes the features whose
+    bounding box touches its own windows, over the extent of those windows.
+    Requires ``dask``.
+
+    Parameters
+    ----------
+    raster_path : str or list of str
+        Path to raster file, or paths to rasters on the same grid whose bands
+        are stacked side by side.
+    vector_path : str
+        Optional path to vector file. If given, raster pixels will be extracted
+        from features in the vector. If None, all raster pixels are converted.
+    windows_per_partition : int
+        Number of windows read into each partition.
+    **kwargs
+        Other options, see :func:`iter_raster_to_dataframe`. ``tile_size``
+        and ``memory_budget`` set the size of the windows.
+
+    Returns
+    -------
+    dask.dataframe.DataFrame
+        Without a vector, and unless no data pixels are dropped, the index
+        matches :func:`raster_to_dataframe` and the divisions are known.
+    """
+    try:
+        import dask
+        import dask.dataframe as dd
+    except ImportError:
+        raise ImportError('dask is required to create Dask DataFrames.')
+
+    if windows_per_partition < 1:
+        raise ValueError('windows_per_partition must be at least 1.')
+
+    # Read the vector once, each partition gets a copy of its features.
+    vector = None
+    if vector_path is not None:
+        vector = util.open_vector(vector_path, with_geopandas=True)
+
+    # Only the windows and columns are needed here, the mask is not burnt.
+    # The window grid and how the vector is read (as points or not) come
+    # from all features, not from the features of a partition.
+    with _RasterPixels(raster_path, vector_path=vector,
+                       **kwargs) as raster_pixels:
+        windows = raster_pixels.windows
+        meta = raster_pixels.empty_dataframe()
+        kwargs = dict(kwargs, window_size=raster_pixels.window_size,
+                      points=raster_pixels.pairs is not None)
+        if vector is not None:
+            feature_index = tiling.bounds_index(
+                raster_pixels.ras, raster_pixels.window_size,
+                raster_pixels.feature_bounds)
 
-            idx = (1, 2)  # Assume multiband
-            if ras_arr.ndim == 2:
-                idx = (0, 1)  # Handle single band rasters
+    if not windows:
+        return dd.from_pandas(meta, npartitions=1)
 
-            mask_arr = np.ones((ras_arr.shape[idx[0]], ras_arr.shape[idx[1]]))
-            pixels = util.get_pixels(ras_arr, mask_arr).transpose()
-            tile_dfs.append(pd.DataFrame(pixels, columns=raster_band_names))
+    chunks = [windows[i:i + windows_per_partition]
+              for i in range(0, len(windows), windows_per_partition)]
 
-        # Merge all the tiles.
-        out_df = pd.concat(tile_dfs)
+    # Every pixel of a window is kept, so the partition sizes are known.
+    starts = [None] * len(chunks)
+    divisions = None
+    if vector is None and kwargs.get('nodata') in (None, 'nan'):
+        sizes = [sum(np.prod(tiling.buffer_size(
+            window, kwargs.get('resolution'))) for window in chunk)
+            for chunk in chunks]
+        ends = np.cumsum(sizes)
+        starts = [int(end - size) for end, size in zip(ends, sizes)]
+        divisions = tuple(starts) + (int(ends[-1]) - 1, )
 
-    # TODO mask no data values.
+    # The vector is put in the graph once, shared by the partitions. A cached
+    # mask is burned from all features, so is shared by the partitions too.
+    features = [None] * len(chunks)
+    if vector is not None:
+        if kwargs.get('mask_cache') is None:
+            features = [tiling.touched_bounds(feature_index, chunk)
+                        for chunk in chunks]
+        vector = dask.delayed(vector)
 
-    # Remove temporary files.
-    if temp_dir is not None:
-        shutil.rmtree(temp_dir, ignore_errors=True)
+    categories = collections.OrderedDict(
+        (col, dtype) for col, dtype in meta.dtypes.items()
+        if isinstance(dtype, pd.CategoricalDtype))
 
-    # Return dropping any extra cols.
-    return out_df.drop(columns=['__fid__', 'geometry'], errors='ignore')
+    parts = [dask.delayed(_dask_partition)(
+        raster_path, vector, chunk_features, chunk, start, categories,
+        kwargs)
+        for chunk, chunk_features, start in zip(chunks, features, starts)]
+    return dd.from_delayed(parts, meta=meta, divisions=divisions)
@@ -1,10 +1,291 @@
 # -*- coding: utf-8 -*-
 """Utils for reading a GDAL Dataset in small tiles."""
+import logging
+import collections
+from concurrent.futures import ThreadPoolExecutor
 
+import numpy as np
+from osgeo import gdal, gdal_array
 
-def windows(ras, size=256):
+from rastertodataframe import util
+
+log = logging.getLogger(__name__)
+
+
+def _block_size(ras):
+    """Largest block of all bands, bands are usually the same."""
+    block_sizes = [ras.GetRasterBand(i).GetBlockSize()
+                   for i in range(1, ras.RasterCount + 1)]
+    return (max(block[0] for block in block_sizes),
+            max(block[1] for block in block_sizes))
+
+
+def block_window_size(ras, size=256):
+    """Get a window size aligned to the native blocks of a raster.
+
+    The window is a whole number of blocks with about ``size * size`` pixels.
+    For strip organised rasters (blocks the full width of the raster) windows
+    span the full width and a whole number of strips.
+
+    Parameters
+    ----------
+    ras : gdal.Dataset
+        Input raster.
+    size : int
+        Approximate size of window in pixels in the x and y direction.
+
+    Returns
+    -------
+    tuple[int]
+        x size and y size of the window.
+    """
+    ras_x = ras.RasterXSize
+    ras_y = ras.RasterYSize
+
+    block_x, block_y = _block_size(ras)
+    xsize = min(ras_x, max(1, size // block_x) * block_x)
+    ysize = max(1, (size * size // xsize) // block_y) * block_y
+    return xsize, min(ras_y, ysize)
+
+
+def budget_window_size(ras, memory_budget, block_aligned=False,
+                       band_list=None):
+    """Get the largest window size whose raster array fits in a memory
+    budget.
+
+    Windows span the full width of the raster (the order pixels are stored
+    in) and as many rows as fit. If a single row does not fit, the window is
+    a part of a row. Windows are rectangular, not square, so each read is
+    close to the budget whatever the number and data type of the bands.
+
+    Parameters
+    ----------
+    ras : gdal.Dataset
+        Input raster.
+    memory_budget : int
+        Maximum size in bytes of the array of a window.
+    block_aligned : bool
+        If True, windows are made of whole blocks of the raster. A window is
+        at least one block, even if that is over the budget.
+    band_list : list[int] or None
+        Band numbers (1-based) read. If None, all bands.
+
+    Returns
+    -------
+    tuple[int]
+        x size and y size of the window.
+    """
+    ras_x = ras.RasterXSize
+    ras_y = ras.RasterYSize
+    if band_list is None:
+        band_list = range(1, ras.RasterCount + 1)
+
+    # Bytes of a pixel of all bands read.
+    pixel_bytes = sum(
+        gdal.GetDataTypeSize(ras.GetRasterBand(i).DataType) // 8
+        for i in band_list)
+    num_pixels = max(1, memory_budget // max(1, pixel_bytes))
+
+    unit_x, unit_y = _block_size(ras) if block_aligned else (1, 1)
+    row_pixels = ras_x * unit_y
+    if row_pixels <= num_pixels:
+        xsize = ras_x
+        ysize = (num_pixels // row_pixels) * unit_y
+    else:
+        xsize = max(1, num_pixels // (unit_x * unit_y)) * unit_x
+        ysize = unit_y
+    xsize, ysize = min(ras_x, xsize), min(ras_y, ysize)
+
+    log.debug('Window size %dx%d for a memory budget of %d bytes: '
+              '%d bytes per pixel, %d bytes per window', xsize, ysize,
+              memory_budget, pixel_bytes, xsize * ysize * pixel_bytes)
+    return xsize, ysize
+
+
+def _window_ranges(ras_x, ras_y, size_x, size_y, bounds):
+    """Find the windows of a raster each of a set of pixel bounds touches.
+
+    Returns
+    -------
+    tuple[np.ndarray]
+        Boolean array, True for the bounds inside the raster, and the first
+        window column, first window row, last window column + 1 and last
+        window row + 1 of each bounds inside the raster.
+    """
+    # Clip to the raster, dropping bounds outside it.
+    bounds = np.asarray(bounds, dtype=np.int64).reshape(-1, 4)
+    col_min = np.clip(bounds[:, 0], 0, ras_x)
+    row_min = np.clip(bounds[:, 1], 0, ras_y)
+    col_max = np.clip(bounds[:, 2], 0, ras_x)
+    row_max = np.clip(bounds[:, 3], 0, ras_y)
+    inside = (col_max > col_min) & (row_max > row_min)
+
+    return (inside, col_min[inside] // size_x, row_min[inside] // size_y,
+            (col_max[inside] - 1) // size_x + 1,
+            (row_max[inside] - 1) // size_y + 1)
+
+
+def _touched_windows(ras_x, ras_y, size_x, size_y, bounds):
+    """Find which windows of a raster intersect any of a set of pixel bounds.
+
+    Parameters
+    ----------
+    ras_x : int
+        Raster x size.
+    ras_y : int
+        Raster y size.
+    size_x : int
+        Window x size.
+    size_y : int
+        Window y size.
+    bounds : np.ndarray
+        Array of shape (n, 4) of pixel bounds, see
+        :func:`rastertodataframe.util.get_pixel_bounds`.
+
+    Returns
+    -------
+    np.ndarray
+        Boolean array of shape [window row][window column], True if a window
+        intersects any bounds.
+    """
+    n_win_x = -(-ras_x // size_x)
+    n_win_y = -(-ras_y // size_y)
+
+    # First and last window touched by each bounds.
+    _, win_col_min, win_row_min, win_col_max, win_row_max = _window_ranges(
+        ras_x, ras_y, size_x, size_y, bounds)
+
+    # Mark the windows with a 2D difference array, so each bounds costs O(1).
+    diff = np.zeros((n_win_y + 1, n_win_x + 1), dtype=np.int64)
+    np.add.at(diff, (win_row_min, win_col_min), 1)
+    np.add.at(diff, (win_row_min, win_col_max), -1)
+    np.add.at(diff, (win_row_max, win_col_min), -1)
+    np.add.at(diff, (win_row_max, win_col_max), 1)
+    counts = diff.cumsum(axis=0).cumsum(axis=1)
+
+    return counts[:n_win_y, :n_win_x] > 0
+
+
+BoundsIndex = collections.namedtuple(
+    'BoundsIndex', ['keys', 'index', 'size_x', 'size_y', 'num_win_x'])
+
+
+def bounds_index(ras, window_size, bounds):
+    """Index which of a set of pixel bounds intersect each window of a
+    raster, for :func:`touched_bounds`.
+
+    Each bounds is sorted into the cells of the window grid it touches, so
+    building the index is proportional to the number of bounds (and the
+    windows each touches) rather than bounds times windows.
+
+    Parameters
+    ----------
+    ras : gdal.Dataset
+        Input raster.
+    window_size : tuple[int]
+        x size and y size of the windows, see :func:`window_size`.
+    bounds : np.ndarray
+        Array of shape (n, 4) of pixel bounds, see
+        :func:`rastertodataframe.util.get_pixel_bounds`.
+
+    Returns
+    -------
+    BoundsIndex
+        Window key (window row * ``num_win_x`` + window column) and bounds
+        index of each intersecting window and bounds pair, ordered by key
+        then bounds index.
+    """
+    size_x, size_y = window_size
+    num_win_x = -(-ras.RasterXSize // size_x)
+    inside, col_min, row_min, col_max, row_max = _window_ranges(
+        ras.RasterXSize, ras.RasterYSize, size_x, size_y, bounds)
+
+    # One pair for each cell of the window range of each bounds.
+    num_cols = col_max - col_min
+    num_cells = num_cols * (row_max - row_min)
+    index = np.repeat(np.flatnonzero(inside), num_cells)
+    cell = np.arange(len(index)) - np.repeat(
+        np.cumsum(num_cells) - num_cells, num_cells)
+    num_cols = np.repeat(num_cols, num_cells)
+    keys = ((np.repeat(row_min, num_cells) + cell // num_cols) * num_win_x +
+            np.repeat(col_min, num_cells) + cell % num_cols)
+
+    order = np.argsort(keys, kind='stable')
+    return BoundsIndex(keys[order], index[order], size_x, size_y, num_win_x)
+
+
+def touched_bounds(bounds_index, windows):
+    """Find which of a set of pixel bounds intersect any of a set of windows.
+
+    Parameters
+    ----------
+    bounds_index : BoundsIndex
+        Index of the bounds, see :func:`bounds_index`.
+    windows : list of tuple
+        Windows (x size, y size, x offset and y offset) of the grid the index
+        was built for, see :func:`windows`.
+
+    Returns
+    -------
+    np.ndarray
+        Sorted indices of the bounds intersecting any window.
+    """
+    win_keys = np.array(
+        [(yoff // bounds_index.size_y) * bounds_index.num_win_x +
+         xoff // bounds_index.size_x for _, _, xoff, yoff in windows],
+        dtype=np.int64)
+    starts = np.searchsorted(bounds_index.keys, win_keys, side='left')
+    ends = np.searchsorted(bounds_index.keys, win_keys, side='right')
+
+    # The bounds of a single window are already sorted.
+    if len(windows) == 1:
+        return bounds_index.index[starts[0]:ends[0]]
+    return np.unique(np.concatenate(
+        [bounds_index.index[start:end] for start, end in zip(starts, ends)] +
+        [np.empty(0, dtype=bounds_index.index.dtype)]))
+
+
+def window_size(ras, size=256, block_aligned=False, memory_budget=None,
+                band_list=None):
+    """Get the (full) window size used by :func:`windows`. Windows at the
+    right and bottom edges of the raster may be smaller.
+
+    Parameters
+    ----------
+    ras : gdal.Dataset
+        Input raster.
+    size : int
+        Size of window in pixels.
+    block_aligned : bool
+        If True, the size is aligned to the blocks of the raster. See
+        :func:`block_window_size`.
+    memory_budget : int or None
+        If given, ``size`` is ignored and the window size is chosen to fit in
+        this many bytes. See :func:`budget_window_size`.
+    band_list : list[int] or None
+        Band numbers (1-based) read, for ``memory_budget``.
+
+    Returns
+    -------
+    tuple[int]
+        x size and y size of the window.
+    """
+    if memory_budget is not None:
+        return budget_window_size(ras, memory_budget,
+                                  block_aligned=block_aligned,
+                                  band_list=band_list)
+    if block_aligned:
+        return block_window_size(ras, size=size)
+    return size, size
+
+
+def windows(ras, size=256, block_aligned=False, bounds=None,
+            memory_budget=None, band_list=None):
     """Generator for raster window size/offsets.
 
+    Windows are returned in row-major order (left to right, then top to
+    bottom), the order blocks are stored in.
+
     Parameters
     ----------
     ras : gdal.Dataset
@@ -12,6 +293,20 @@ def windows(ras, size=256):
     size : int
         Size of window in pixels. One value required which is used for both the
         x and y size. E.g 256 means a 256x256 window.
+    block_aligned : bool
+        If True, ``size`` is adjusted so that windows are made of whole blocks
+        of the raster, see :func:`block_window_size`. Each block is then only
+        read (and decompressed) once.
+    bounds : np.ndarray or None
+        Optional array of shape (n, 4) of pixel bounds (e.g. of vector
+        features, see :func:`rastertodataframe.util.get_pixel_bounds`). If
+        given, only windows intersecting at least one bounds are returned.
+    memory_budget : int or None
+        If given, the window size is chosen so the array of a window is at
+        most this many bytes, instead of using ``size``. See
+        :func:`budget_window_size`.
+    band_list : list[int] or None
+        Band numbers (1-based) read, for ``memory_budget``.
 
     Yields
     ------
@@ -21,14 +316,177 @@ def windows(ras, size=256):
     """
     ras_x = ras.RasterXSize
     ras_y = ras.RasterYSize
-    for xoff in range(0, ras_x, size):
-        xsize = (size if size + xoff <= ras_x else ras_x - xoff)
-        for yoff in range(0, ras_y, size):
-            ysize = (size if size + yoff <= ras_y else ras_y - yoff)
+    size_x, size_y = window_size(
+        ras, size=size, block_aligned=block_aligned,
+        memory_budget=memory_budget, band_list=band_list)
+
+    if bounds is not None:
+        touched = _touched_windows(ras_x, ras_y, size_x, size_y, bounds)
+
+    for yoff in range(0, ras_y, size_y):
+        ysize = (size_y if size_y + yoff <= ras_y else ras_y - yoff)
+        for xoff in range(0, ras_x, size_x):
+            xsize = (size_x if size_x + xoff <= ras_x else ras_x - xoff)
+            if bounds is not None and \
+                    not touched[yoff // size_y, xoff // size_x]:
+                continue
             yield xsize, ysize, xoff, yoff
 
 
-def tiles(ras, size=256):
+def buffer_size(window, resolution=None):
+    """Get the size of the array a window is read into.
+
+    Parameters
+    ----------
+    window : tuple[int]
+        4 element tuple containing the x size, y size, x offset and y offset
+        of the window. See :func:`windows`.
+    resolution : int or None
+        Factor to reduce the resolution by, e.g. 4 reads every 4x4 pixels as
+        one. If None, the window is read at full resolution.
+
+    Returns
+    -------
+    tuple[int]
+        x size and y size of the array.
+    """
+    xsize, ysize, _, _ = window
+    if resolution is None:
+        return xsize, ysize
+    return -(-xsize // resolution), -(-ysize // resolution)
+
+
+def read_window(ras, window, band_list=None, resolution=None):
+    """Read a window of a raster.
+
+    Parameters
+    ----------
+    ras : gdal.Dataset
+        Input raster.
+    window : tuple[int]
+        4 element tuple containing the x size, y size, x offset and y offset
+        of the window. See :func:`windows`.
+    band_list : list[int] or None
+        Band numbers (1-based) to read. If None, all bands are read.
+    resolution : int or None
+        Factor to reduce the resolution by, see :func:`buffer_size`. GDAL
+        reads from the raster's overviews where they exist, otherwise pixels
+        are subsampled (nearest neighbour).
+
+    Returns
+    -------
+    np.ndarray
+        Raster array in form [band][y][x].
+    """
+    xsize, ysize, xoff, yoff = window
+    buf_xsize, buf_ysize = buffer_size(window, resolution=resolution)
+    if band_list is None:
+        return ras.ReadAsArray(xoff=xoff, yoff=yoff, xsize=xsize, ysize=ysize,
+                               buf_xsize=buf_xsize, buf_ysize=buf_ysize)
+
+    # Read only the requested bands, in one call. The bytes are copied to a
+    # bytearray so the array (and DataFrames viewing it) can be written to.
+    band_list = list(band_list)
+    buf_type = ras.GetRasterBand(band_list[0]).DataType
+    buf = ras.ReadRaster(xoff, yoff, xsize, ysize, buf_xsize, buf_ysize,
+                         buf_type, band_list=band_list)
+    arr = np.frombuffer(
+        bytearray(buf),
+        dtype=gdal_array.GDALTypeCodeToNumericTypeCode(buf_type))
+    arr = arr.reshape((len(band_list), buf_ysize, buf_xsize))
+    return arr if len(band_list) > 1 else arr[0]
+
+
+def read_mask_window(ras, window, band_list=None, resolution=None):
+    """Read a window of the GDAL mask bands of a raster.
+
+    Only explicit mask bands (e.g. alpha bands or per dataset masks) are read.
+    Bands without a mask, or where the mask is derived from the no data value,
+    are returned as all valid.
+
+    Parameters
+    ----------
+    ras : gdal.Dataset
+        Input raster.
+    window : tuple[int]
+        4 element tuple containing the x size, y size, x offset and y offset
+        of the window. See :func:`windows`.
+    band_list : list[int] or None
+        Band numbers (1-based) to read the masks of. If None, all bands.
+    resolution : int or None
+        Factor to reduce the resolution by, see :func:`buffer_size`.
+
+    Returns
+    -------
+    np.ndarray
+        Mask array in form [band][y][x], zero where invalid.
+    """
+    xsize, ysize, xoff, yoff = window
+    buf_xsize, buf_ysize = buffer_size(window, resolution=resolution)
+    if band_list is None:
+        band_list = range(1, ras.RasterCount + 1)
+    band_list = list(band_list)
+    arr = np.full((len(band_list), buf_ysize, buf_xsize), 255,
+                  dtype=np.uint8)
+
+    for i, band_num in enumerate(band_list):
+        band = ras.GetRasterBand(band_num)
+        flags = band.GetMaskFlags()
+        if flags & (gdal.GMF_ALL_VALID | gdal.GMF_NODATA):
+            continue
+
+        mask_arr = band.GetMaskBand().ReadAsArray(
+            xoff, yoff, xsize, ysize, buf_xsize, buf_ysize)
+
+        # A per dataset mask is shared by all bands, only read it once.
+        if flags & gdal.GMF_PER_DATASET:
+            arr[:] = mask_arr
+            break
+        arr[i] = mask_arr
+
+    return arr if len(band_list) > 1 else arr[0]
+
+
+def _prefetch(read, ras, windows, depth, **kwargs):
+    """Read windows ahead of the caller on background threads.
+
+    Each thread reads with its own dataset handle, opened from the file of
+    ``ras``, as GDAL datasets are not safe to share between threads.
+
+    Parameters
+    ----------
+    read : callable
+        Function to read a window, :func:`read_window` or
+        :func:`read_mask_window`.
+    ras : gdal.Dataset
+        Input raster, opened from a file.
+    windows : iterable[tuple[int]]
+        Windows to read.
+    depth : int
+        Number of windows read ahead of the one being yielded.
+    **kwargs
+        Options passed to ``read``.
+
+    Yields
+    ------
+    np.ndarray
+        Array of each window.
+    """
+    path = ras.GetDescription()
+    if not path or ras.GetDriver().ShortName == 'MEM':
+        raise ValueError('Prefetching requires a raster opened from a file.')
+
+    def read_thread(window):
+        return read(util.open_thread_raster(path), window, **kwargs)
+
+    with ThreadPoolExecutor(max_workers=depth) as executor:
+        for arr in ordered_map(read_thread, ((window, ) for window in windows),
+                               executor=executor, depth=depth + 1):
+            yield arr
+
+
+def tiles(ras, size=256, block_aligned=False, bounds=None, band_list=None,
+          resolution=None, memory_budget=None, prefetch=0):
     """Generator return a raster array in tiles.
 
     Parameters
@@ -38,11 +496,127 @@ def tiles(ras, size=256):
     size : int
         Size of window in pixels. One value required which is used for both the
         x and y size. E.g 256 means a 256x256 window.
+    block_aligned : bool
+        If True, windows are aligned to the blocks of the raster. See
+        :func:`windows`.
+    bounds : np.ndarray or None
+        Optional pixel bounds, only windows intersecting them are read. See
+        :func:`windows`.
+    band_list : list[int] or None
+        Band numbers (1-based) to read. If None, all bands are read.
+    resolution : int or None
+        Factor to reduce the resolution by, see :func:`read_window`.
+    memory_budget : int or None
+        Maximum size in bytes of the array of a window, used instead of
+        ``size``. See :func:`budget_window_size`.
+    prefetch : int
+        Number of windows to read ahead on background threads while the
+        caller processes the current one. Each thread reopens the raster
+        from its file. If 0 (default), windows are read when requested.
 
     Yields
     ------
     np.ndarray
         Raster array in form [band][y][x].
     """
-    for xsize, ysize, xoff, yoff in windows(ras, size=size):
-        yield ras.ReadAsArray(xoff=xoff, yoff=yoff, xsize=xsize, ysize=ysize)
+    window_iter = windows(ras, size=size, block_aligned=block_aligned,
+                          bounds=bounds, memory_budget=memory_budget,
+                          band_list=band_list)
+    if prefetch:
+        for arr in _prefetch(read_window, ras, window_iter, prefetch,
+                             band_list=band_list, resolution=resolution):
+            yield arr
+        return
+
+    for window in window_iter:
+        yield read_window(ras, window, band_list=band_list,
+                          resolution=resolution)
+
+
+def mask_tiles(ras, size=256, block_aligned=False, bounds=None,
+               band_list=None, resolution=None, memory_budget=None,
+               prefetch=0):
+    """Generator return the GDAL mask bands of a raster in tiles.
+
+    See :func:`read_mask_window` for the masks that are read.
+
+    Parameters
+    ----------
+    ras : gdal.Dataset
+        Input raster.
+    size : int
+        Size of window in pixels. One value required which is used for both the
+        x and y size. E.g 256 means a 256x256 window.
+    block_aligned : bool
+        If True, windows are aligned to the blocks of the raster. See
+        :func:`windows`.
+    bounds : np.ndarray or None
+        Optional pixel bounds, only windows intersecting them are read. See
+        :func:`windows`.
+    band_list : list[int] or None
+        Band numbers (1-based) to read. If None, all bands are read.
+    resolution : int or None
+        Factor to reduce the resolution by, see :func:`read_window`.
+    memory_budget : int or None
+        Maximum size in bytes of the array of a window, used instead of
+        ``size``. See :func:`budget_window_size`.
+    prefetch : int
+        Number of windows to read ahead on background threads while the
+        caller processes the current one. Each thread reopens the raster
+        from its file. If 0 (default), windows are read when requested.
+
+    Yields
+    ------
+    np.ndarray
+        Mask array in form [band][y][x], zero where invalid.
+    """
+    window_iter = windows(ras, size=size, block_aligned=block_aligned,
+                          bounds=bounds, memory_budget=memory_budget,
+                          band_list=band_list)
+    if prefetch:
+        for arr in _prefetch(read_mask_window, ras, window_iter, prefetch,
+                             band_list=band_list, resolution=resolution):
+            yield arr
+        return
+
+    for window in window_iter:
+        yield read_mask_window(ras, window, band_list=band_list,
+                               resolution=resolution)
+
+
+def ordered_map(func, iterable, executor=None, depth=1):
+    """Map a function over an iterable of argument tuples using an executor,
+    yielding results in the order of the input.
+
+    At most ``depth`` calls are in progress at any time, so memory use is
+    bounded for long (or infinite) iterables.
+
+    Parameters
+    ----------
+    func : callable
+    iterable : iterable[tuple]
+        Arguments of each call of ``func``.
+    executor : concurrent.futures.Executor or None
+        Executor to submit calls to. If None, calls are made in order in the
+        current thread.
+    depth : int
+        Maximum number of calls submitted but not yet yielded.
+
+    Yields
+    ------
+    object
+        Result of each call of ``func``.
+    """
+    if executor is None:
+        for args in iterable:
+            yield func(*args)
+        return
+
+    pending = collections.deque()
+    for args in iterable:
+        pending.append(executor.submit(func, *args))
+        if len(pending) >= max(1, depth):
+            yield pending.popleft().result()
+
+    while pending:
+        yield pending.popleft().result()
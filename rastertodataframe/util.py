@@ -1,6 +1,9 @@
 # -*- coding: utf-8 -*-
 import logging
+import threading
+import functools
 
+import numpy as np
 import pyproj
 import geopandas as gpd
 from osgeo import gdal, ogr, osr
@@ -8,7 +11,10 @@ from osgeo import gdal, ogr, osr
 log = logging.getLogger(__name__)
 
 
-def open_raster(path, read_only=True):
+_thread_local = threading.local()
+
+
+def open_raster(path, read_only=True, shared=True):
     """Open a raster using GDAL.
 
     Parameters
@@ -17,13 +23,40 @@ def open_raster(path, read_only=True):
         Path of file to open.
     read_only : bool
         File mode, set to False to open in "update" mode.
+    shared : bool
+        Set to False to always open a new dataset handle.
 
     Returns
     -------
     GDAL dataset
     """
     access = gdal.GA_ReadOnly if read_only else gdal.GA_Update
-    return gdal.OpenShared(path, access)
+    if shared:
+        return gdal.OpenShared(path, access)
+    return gdal.Open(path, access)
+
+
+def open_thread_raster(path):
+    """Open a raster (read only) with a dataset handle private to the calling
+    thread. GDAL datasets are not safe to share between threads. The handle is
+    cached so each thread only opens a raster once.
+
+    Parameters
+    ----------
+    path : str
+        Path of file to open.
+
+    Returns
+    -------
+    GDAL dataset
+    """
+    rasters = getattr(_thread_local, 'rasters', None)
+    if rasters is None:
+        rasters = _thread_local.rasters = {}
+
+    if path not in rasters:
+        rasters[path] = open_raster(path, shared=False)
+    return rasters[path]
 
 
 def open_vector(path, with_geopandas=False, read_only=True):
@@ -31,8 +64,9 @@ def open_vector(path, with_geopandas=False, read_only=True):
 
     Parameters
     ----------
-    path : str
-        Path to vector file.
+    path : str or gpd.GeoDataFrame
+        Path to vector file. A GeoDataFrame is copied when opening with
+        geopandas.
     with_geopandas : bool
         Set to True to open with geopandas, else use OGR.
     read_only : bool
@@ -43,6 +77,8 @@ def open_vector(path, with_geopandas=False, read_only=True):
     GeoDataFrame if ``with_geopandas`` else OGR datsource.
     """
     if with_geopandas:
+        if isinstance(path, gpd.GeoDataFrame):
+            return path.copy()
         return gpd.read_file(path)
 
     update = False if read_only else True
@@ -95,8 +131,10 @@ def _get_gpd_epsg(gdf):
     return _epsg_from_projection(pyproj.Proj(gdf.crs).srs)
 
 
+@functools.lru_cache(maxsize=128)
 def _epsg_from_projection(prj):
-    """Return the EPSG code from a projection string.
+    """Return the EPSG code from a projection string. Results are cached by
+    projection string.
 
     Parameters
     ----------
@@ -155,7 +193,108 @@ def same_epsg(data1, data2):
     return get_epsg(data1) == get_epsg(data2)
 
 
-def _create_empty_raster(template, out_path, n_bands=1, no_data_value=None):
+def check_same_epsg(data1, data2):
+    """Raise an error if sets of data do not have the same EPSG.
+
+    Parameters
+    ----------
+    data1 : gdal.DataSet or ogr.DataSource or gpd.GeoDataFrame
+    data2 : gdal.DataSet or ogr.DataSource or gpd.GeoDataFrame
+
+    Raises
+    ------
+    ValueError
+        If the EPSG codes differ.
+    """
+    if not same_epsg(data1, data2):
+        raise ValueError(
+            'Raster and vector are not the same EPSG.\n'
+            '{} != {}'.format(get_epsg(data1), get_epsg(data2))
+        )
+
+
+def reproject_vector(vec, ras):
+    """Transform a vector to the EPSG of a raster, in memory.
+
+    Parameters
+    ----------
+    vec : gpd.GeoDataFrame or ogr.DataSource
+    ras : gdal.Dataset
+
+    Returns
+    -------
+    gpd.GeoDataFrame
+    """
+    if isinstance(vec, ogr.DataSource):
+        vec = open_vector(vec.GetName(), with_geopandas=True)
+
+    epsg = get_epsg(ras)
+    log.debug('Reprojecting vector to EPSG:%s', epsg)
+    return vec.to_crs(epsg=epsg)
+
+
+def warp_raster(raster_path, epsg, out_path):
+    """Warp a raster to another EPSG on the fly, as a GDAL VRT. No pixels are
+    written, they are resampled (nearest neighbour) when read.
+
+    Parameters
+    ----------
+    raster_path : str
+    epsg : int
+        EPSG code to warp the raster to.
+    out_path : str
+        Path of the output VRT.
+
+    Returns
+    -------
+    gdal.Dataset
+    """
+    log.debug('Warping %s to EPSG:%s', raster_path, epsg)
+    out_ds = gdal.Warp(out_path, open_raster(raster_path), format='VRT',
+                       dstSRS='EPSG:{}'.format(epsg))
+    if out_ds is None:
+        raise RuntimeError('Unable to warp: {}'.format(raster_path))
+
+    # Explicitly close raster to ensure it is saved.
+    out_ds.FlushCache()
+    out_ds = None
+
+    return open_raster(out_path)
+
+
+def check_same_grid(ras1, ras2):
+    """Raise an error if two rasters are not on the same pixel grid.
+
+    Parameters
+    ----------
+    ras1 : gdal.Dataset
+    ras2 : gdal.Dataset
+
+    Raises
+    ------
+    ValueError
+        If the size, geotransform or EPSG of the rasters differ.
+    """
+    size1 = (ras1.RasterXSize, ras1.RasterYSize)
+    size2 = (ras2.RasterXSize, ras2.RasterYSize)
+    if size1 != size2:
+        raise ValueError(
+            'Rasters are not the same size.\n{} != {}'.format(size1, size2))
+
+    gt1, gt2 = ras1.GetGeoTransform(), ras2.GetGeoTransform()
+    if not np.allclose(gt1, gt2, rtol=0, atol=1e-9 * max(abs(gt1[1]), 1)):
+        raise ValueError(
+            'Rasters do not have the same geotransform.\n{} != {}'.format(
+                gt1, gt2))
+
+    if not same_epsg(ras1, ras2):
+        raise ValueError(
+            'Rasters are not the same EPSG.\n{} != {}'.format(
+                get_epsg(ras1), get_epsg(ras2)))
+
+
+def _create_empty_raster(template, out_path, n_bands=1, no_data_value=None,
+                         driver_name=None, dtype=None, creation_options=None):
     """Create a new empty raster using GDAL. Inherits all but the data from the
     given template dataset.
 
@@ -167,6 +306,13 @@ def _create_empty_raster(template, out_path, n_bands=1, no_data_value=None):
         Number of bands to create in the output raster.
     no_data_value : float or None
         No data value, if None uses the same as ``template``.
+    driver_name : str or None
+        GDAL driver for the output (e.g. 'MEM'), if None uses the same as
+        ``template``.
+    dtype : int or None
+        GDAL data type of the output, if None uses the same as ``template``.
+    creation_options : list of str or None
+        GDAL driver creation options, e.g. ``['COMPRESS=DEFLATE']``.
 
     Returns
     -------
@@ -176,11 +322,16 @@ def _create_empty_raster(template, out_path, n_bands=1, no_data_value=None):
     x_size = template.RasterXSize
     y_size = template.RasterYSize
     n_bands = int(n_bands) if n_bands is not None else template.RasterCount
-    dtype = template.GetRasterBand(1).DataType
+    if dtype is None:
+        dtype = template.GetRasterBand(1).DataType
 
     # Create the driver.
-    driver = template.GetDriver()
-    out_dataset = driver.Create(out_path, x_size, y_size, n_bands, dtype)
+    if driver_name is None:
+        driver = template.GetDriver()
+    else:
+        driver = gdal.GetDriverByName(driver_name)
+    out_dataset = driver.Create(out_path, x_size, y_size, n_bands, dtype,
+                                options=creation_options or [])
 
     # Set the projection.
     out_dataset.SetGeoTransform(template.GetGeoTransform())
@@ -196,20 +347,99 @@ def _create_empty_raster(template, out_path, n_bands=1, no_data_value=None):
     return out_dataset
 
 
-def burn_vector_mask_into_raster(raster_path, vector_path, out_path,
-                                 vector_field=None):
+def _ogr_field_type(series):
+    """Get the OGR field type matching a Pandas Series.
+
+    Parameters
+    ----------
+    series : pd.Series
+
+    Returns
+    -------
+    int
+    """
+    if np.issubdtype(series.dtype, np.integer):
+        return ogr.OFTInteger64
+    elif np.issubdtype(series.dtype, np.floating):
+        return ogr.OFTReal
+    return ogr.OFTString
+
+
+def _gdf_to_ogr(gdf, fields=None):
+    """Copy a GeoDataFrame into an in-memory OGR DataSource.
+
+    Parameters
+    ----------
+    gdf : gpd.GeoDataFrame
+    fields : list[str] or None
+        Columns to copy as attributes. If None, only geometries are copied.
+
+    Returns
+    -------
+    ogr.DataSource
+        Memory DataSource with a single layer and no spatial reference.
+    """
+    fields = [] if fields is None else list(fields)
+
+    datasource = ogr.GetDriverByName('Memory').CreateDataSource('')
+    layer = datasource.CreateLayer('', geom_type=ogr.wkbUnknown)
+
+    # Python types used to convert NumPy scalars for OGR.
+    converters = []
+    for field in fields:
+        field_type = _ogr_field_type(gdf[field])
+        layer.CreateField(ogr.FieldDefn(field, field_type))
+        converters.append({ogr.OFTInteger64: int,
+                           ogr.OFTReal: float}.get(field_type, str))
+
+    layer_defn = layer.GetLayerDefn()
+    values = [gdf[field].values for field in fields]
+    for row, geom in enumerate(gdf.geometry):
+        feature = ogr.Feature(layer_defn)
+        if geom is not None:
+            feature.SetGeometry(ogr.CreateGeometryFromWkb(geom.wkb))
+        for i, convert in enumerate(converters):
+            feature.SetField(i, convert(values[i][row]))
+        layer.CreateFeature(feature)
+
+    return datasource
+
+
+def burn_vector_mask_into_raster(raster_path, vector_path, out_path=None,
+                                 vector_field=None, dtype=None,
+                                 creation_options=None, reproject=True,
+                                 driver_name=None):
     """Create a new raster based on the input raster with vector features
     burned into the raster. To be used as a mask for pixels in the vector.
 
     Parameters
     ----------
-    raster_path : str
-    vector_path : str
-    out_path : str
-        Path for output raster. Format and Datatype are the same as ``ras``.
+    raster_path : str or gdal.Dataset
+        Path to a raster file, or an already open raster.
+    vector_path : str or ogr.DataSource or gpd.GeoDataFrame
+        Path to a vector file, or an already open vector. A GeoDataFrame is
+        rasterized from memory without being written to disk.
+    out_path : str or None
+        Path for output raster. Format and Datatype are the same as ``ras``
+        unless ``driver_name`` and ``dtype`` are given. If None, the raster
+        is created in memory (GDAL MEM driver).
     vector_field : str or None
         Name of a field in the vector to burn values from. If None, all vector
         features are burned with a constant value of 1.
+    dtype : int or None
+        GDAL data type of the output. If None, uses the datatype of ``ras``
+        when writing to ``out_path``, else Byte for a constant burn value or
+        Int32 when burning ``vector_field``.
+    creation_options : list of str or None
+        GDAL driver creation options of ``out_path``.
+    reproject : bool
+        If True (default), a vector with a different EPSG to the raster is
+        transformed to the raster EPSG in memory. If False, differing EPSG
+        codes raise an error.
+    driver_name : str or None
+        GDAL driver of ``out_path`` (e.g. 'GTiff'), if None uses the driver
+        of the raster. Needed when the raster's driver can not create files,
+        e.g. a VRT.
 
     Returns
     -------
@@ -217,36 +447,57 @@ def burn_vector_mask_into_raster(raster_path, vector_path, out_path,
         Single band raster with vector geometries burned.
     """
 
-    ras = open_raster(raster_path)
-    vec = open_vector(vector_path)
+    if isinstance(raster_path, gdal.Dataset):
+        ras = raster_path
+    else:
+        ras = open_raster(raster_path)
+    if isinstance(vector_path, (gpd.GeoDataFrame, ogr.DataSource)):
+        vec = vector_path
+    else:
+        vec = open_vector(vector_path)
 
     # Check EPSG are same, if not reproject vector.
-    if not same_epsg(ras, vec):
-        raise ValueError(
-            'Raster and vector are not the same EPSG.\n'
-            '{} != {}'.format(get_epsg(ras), get_epsg(vec))
-        )
+    if reproject and not same_epsg(ras, vec):
+        vec = reproject_vector(vec, ras)
+    check_same_epsg(ras, vec)
+
+    # GeoDataFrames are rasterized from an in-memory copy.
+    if isinstance(vec, gpd.GeoDataFrame):
+        fields = None if vector_field is None else [vector_field]
+        vec = _gdf_to_ogr(vec, fields=fields)
 
     # Create an empty for GDALRasterize to burn vector values to.
-    out_ds = _create_empty_raster(ras, out_path, n_bands=1, no_data_value=0)
+    if out_path is None:
+        if dtype is None:
+            dtype = gdal.GDT_Byte if vector_field is None else gdal.GDT_Int32
+        out_ds = _create_empty_raster(
+            ras, '', n_bands=1, no_data_value=0, driver_name='MEM',
+            dtype=dtype)
+    else:
+        out_ds = _create_empty_raster(
+            ras, out_path, n_bands=1, no_data_value=0,
+            driver_name=driver_name, dtype=dtype,
+            creation_options=creation_options)
 
     if vector_field is None:
         # Use a constant value for all features.
         burn_values = [1]
-        attribute = None
+        options = ['ALL_TOUCHED=TRUE']
     else:
         # Use the values given in the vector field.
-        burn_values = None
-        attribute = vector_field
-
-    # Options for Rasterize.
-    # note: burnValues and attribute are exclusive.
-    rasterize_opts = gdal.RasterizeOptions(
-        bands=[1],
-        burnValues=burn_values,
-        attribute=attribute,
-        allTouched=True)
-    _ = gdal.Rasterize(out_ds, vector_path, options=rasterize_opts)
+        burn_values = []
+        options = ['ALL_TOUCHED=TRUE', 'ATTRIBUTE={}'.format(vector_field)]
+
+    # note: burn_values and ATTRIBUTE are exclusive.
+    err = gdal.RasterizeLayer(
+        out_ds, [1], vec.GetLayer(0), burn_values=burn_values,
+        options=options)
+    if err != gdal.CE_None:
+        raise RuntimeError('Unable to rasterize: {}'.format(vector_path))
+
+    # In-memory rasters can not be re-opened.
+    if out_path is None:
+        return out_ds
 
     # Explicitly close raster to ensure it is saved.
     out_ds.FlushCache()
@@ -288,7 +539,7 @@ def get_raster_band_names(raster):
     return band_names
 
 
-def get_pixels(ras, mask, mask_val=None):
+def get_pixels(ras, mask, mask_val=None, return_index=False):
     """Get pixels from a raster (with optional mask).
 
     Parameters
@@ -299,11 +550,14 @@ def get_pixels(ras, mask, mask_val=None):
         Array (2D) of zeroes to mask data.
     mask_val : int
         Value of the data pixels in the mask. Default: non-zero.
+    return_index : bool
+        If True, also return the row and column indices of the pixels.
 
     Returns
     -------
     np.ndarray
-        Array of non-masked data.
+        Array of non-masked data, and a tuple of the row and column indices
+        if ``return_index``.
     """
     if mask is None:
         return ras
@@ -314,4 +568,359 @@ def get_pixels(ras, mask, mask_val=None):
     else:
         (i, j) = mask.nonzero()
 
-    return (ras[i, j] if ras.ndim == 2 else ras[:, i, j])
+    pixels = (ras[i, j] if ras.ndim == 2 else ras[:, i, j])
+    if return_index:
+        return pixels, (i, j)
+    return pixels
+
+
+def get_pixels_by_mask(ras, mask, return_index=False):
+    """Get all non-masked pixels from a raster grouped by their mask value.
+
+    Unlike calling :func:`get_pixels` once per mask value, the mask is only
+    scanned once and the pixels are grouped with a single sort.
+
+    Parameters
+    ----------
+    ras : np.ndarray
+        Array of raster data in the form [bands][y][x].
+    mask : np.ndarray
+        Array (2D) of mask values, zero is treated as masked.
+    return_index : bool
+        If True, also return the row and column indices of the pixels.
+
+    Returns
+    -------
+    tuple
+        Array of non-masked data (ordered by mask value), an array of the
+        mask value of each pixel and, if ``return_index``, a tuple of the row
+        and column indices of each pixel.
+    """
+    # Use the mask to get the indices of the non-zero pixels.
+    (i, j) = mask.nonzero()
+    mask_vals = mask[i, j]
+
+    # Group the pixels by mask value, keeping their order within a group.
+    order = np.argsort(mask_vals, kind='mergesort')
+    (i, j) = (i[order], j[order])
+
+    pixels = (ras[i, j] if ras.ndim == 2 else ras[:, i, j])
+    if return_index:
+        return pixels, mask_vals[order], (i, j)
+    return pixels, mask_vals[order]
+
+
+def get_nodata_values(raster):
+    """Get the no data value of each band of a raster.
+
+    Parameters
+    ----------
+    raster : gdal.Dataset
+
+    Returns
+    -------
+    list[float or None]
+        No data value of each band, None if a band has no no data value.
+    """
+    return [raster.GetRasterBand(i).GetNoDataValue()
+            for i in range(1, raster.RasterCount + 1)]
+
+
+def has_mask_band(raster):
+    """Check if any band of a raster has an explicit GDAL mask band (e.g. an
+    alpha band or a per dataset mask). Masks derived from the no data value
+    are not counted.
+
+    Parameters
+    ----------
+    raster : gdal.Dataset
+
+    Returns
+    -------
+    bool
+    """
+    for i in range(1, raster.RasterCount + 1):
+        flags = raster.GetRasterBand(i).GetMaskFlags()
+        if not flags & (gdal.GMF_ALL_VALID | gdal.GMF_NODATA):
+            return True
+    return False
+
+
+def get_valid_pixels(ras, nodata_values, mask=None):
+    """Get which values of a raster array are valid (not no data).
+
+    Parameters
+    ----------
+    ras : np.ndarray
+        Array of raster data in the form [bands][y][x] or [y][x].
+    nodata_values : list[float or None]
+        No data value of each band, None if a band has no no data value.
+    mask : np.ndarray or None
+        Optional array of GDAL mask band values, same shape as ``ras``.
+        Zero is invalid.
+
+    Returns
+    -------
+    np.ndarray
+        Boolean array the same shape as ``ras``, True where valid.
+    """
+    valid = np.ones(ras.shape, dtype=bool)
+
+    # View single band rasters as [1][y][x].
+    ras_3d = ras if ras.ndim == 3 else ras[np.newaxis]
+    valid_3d = valid if valid.ndim == 3 else valid[np.newaxis]
+
+    for i, nodata_value in enumerate(nodata_values):
+        if nodata_value is None:
+            continue
+        if np.isnan(nodata_value):
+            valid_3d[i] &= ~np.isnan(ras_3d[i])
+        else:
+            valid_3d[i] &= ras_3d[i] != nodata_value
+
+    if mask is not None:
+        valid &= mask != 0
+
+    return valid
+
+
+def apply_nodata_policy(ras, valid, nodata='any'):
+    """Apply a no data policy to a raster array.
+
+    Parameters
+    ----------
+    ras : np.ndarray
+        Array of raster data in the form [bands][y][x] or [y][x].
+    valid : np.ndarray
+        Boolean array the same shape as ``ras``, True where valid. See
+        :func:`get_valid_pixels`.
+    nodata : str
+        'any' to drop a pixel if any band is no data, 'all' to drop a pixel
+        only if all bands are no data, 'nan' to keep all pixels and convert no
+        data values to NaN.
+
+    Returns
+    -------
+    tuple[np.ndarray]
+        The raster array (converted to float for 'nan') and a 2D boolean
+        array, True for pixels to keep.
+    """
+    valid_3d = valid if valid.ndim == 3 else valid[np.newaxis]
+
+    if nodata == 'any':
+        return ras, valid_3d.all(axis=0)
+    elif nodata == 'all':
+        return ras, valid_3d.any(axis=0)
+    elif nodata == 'nan':
+        dtype = np.result_type(ras.dtype, np.float32)
+        ras = np.where(valid, ras, np.nan).astype(dtype, copy=False)
+        return ras, np.ones(valid_3d.shape[1:], dtype=bool)
+
+    raise ValueError('Unknown no data policy: {}'.format(nodata))
+
+
+def geo_to_pixel(geotransform, x, y):
+    """Convert map coordinates to (fractional) pixel coordinates.
+
+    Parameters
+    ----------
+    geotransform : list[float]
+        GDAL geotransform of a raster.
+    x : np.ndarray
+        Map x coordinates.
+    y : np.ndarray
+        Map y coordinates.
+
+    Returns
+    -------
+    tuple[np.ndarray]
+        Pixel column (x) and row (y) coordinates.
+    """
+    inv = gdal.InvGeoTransform(geotransform)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    col = inv[0] + inv[1] * x + inv[2] * y
+    row = inv[3] + inv[4] * x + inv[5] * y
+    return col, row
+
+
+def pixel_to_geo(geotransform, col, row):
+    """Convert pixel coordinates to map coordinates, the inverse of
+    :func:`geo_to_pixel`.
+
+    Parameters
+    ----------
+    geotransform : list[float]
+        GDAL geotransform of the raster.
+    col : np.ndarray
+        Pixel column (x) coordinates, add 0.5 for pixel centres.
+    row : np.ndarray
+        Pixel row (y) coordinates.
+
+    Returns
+    -------
+    tuple[np.ndarray]
+        x and y map coordinates.
+    """
+    col = np.asarray(col, dtype=np.float64)
+    row = np.asarray(row, dtype=np.float64)
+
+    x = geotransform[0] + col * geotransform[1] + row * geotransform[2]
+    y = geotransform[3] + col * geotransform[4] + row * geotransform[5]
+    return x, y
+
+
+def get_pixel_bounds(gdf, geotransform):
+    """Get the bounding box of each feature of a vector in pixel coordinates.
+
+    Parameters
+    ----------
+    gdf : gpd.GeoDataFrame
+        Vector in the same projection as the raster.
+    geotransform : list[float]
+        GDAL geotransform of the raster.
+
+    Returns
+    -------
+    np.ndarray
+        Array of shape (features, 4) containing the first column, first row,
+        last column + 1 and last row + 1 of the pixels touched by each feature
+        bounding box. Features without a geometry have an empty box.
+    """
+    bounds = np.array(gdf.bounds.values, dtype=np.float64)
+    empty = np.isnan(bounds).any(axis=1)
+    bounds[empty] = 0
+
+    # Transform all corners, the geotransform may be flipped or rotated.
+    min_x, min_y, max_x, max_y = bounds.T
+    cols, rows = geo_to_pixel(
+        geotransform,
+        np.stack([min_x, min_x, max_x, max_x]),
+        np.stack([min_y, max_y, min_y, max_y]))
+
+    pixel_bounds = np.stack([
+        np.floor(cols.min(axis=0)),
+        np.floor(rows.min(axis=0)),
+        np.floor(cols.max(axis=0)) + 1,
+        np.floor(rows.max(axis=0)) + 1], axis=1).astype(np.int64)
+    pixel_bounds[empty] = 0
+    return pixel_bounds
+
+
+def is_point_vector(gdf):
+    """Check if all the features of a vector are points.
+
+    Parameters
+    ----------
+    gdf : gpd.GeoDataFrame
+
+    Returns
+    -------
+    bool
+    """
+    return len(gdf) > 0 and bool((gdf.geom_type == 'Point').all())
+
+
+def get_point_pixels(gdf, raster):
+    """Get the pixel containing each point of a vector.
+
+    Parameters
+    ----------
+    gdf : gpd.GeoDataFrame
+        Point vector in the same projection as the raster.
+    raster : gdal.Dataset
+
+    Returns
+    -------
+    tuple[np.ndarray]
+        Column, row and (0 indexed) feature index of the points inside the
+        raster.
+    """
+    # The bounds of a point are its coordinates.
+    bounds = np.array(gdf.bounds.values, dtype=np.float64)
+    col, row = geo_to_pixel(
+        raster.GetGeoTransform(), bounds[:, 0], bounds[:, 1])
+
+    with np.errstate(invalid='ignore'):
+        inside = ((col >= 0) & (col < raster.RasterXSize) &
+                  (row >= 0) & (row < raster.RasterYSize))
+
+    index = np.flatnonzero(inside)
+    return (np.floor(col[inside]).astype(np.int64),
+            np.floor(row[inside]).astype(np.int64), index)
+
+
+def get_feature_pixels(gdf, raster, window=None):
+    """Get the pixels touched by each feature of a vector, including pixels
+    touched by more than one (overlapping) feature.
+
+    Each feature is rasterized on its own, only within its bounding box.
+
+    Parameters
+    ----------
+    gdf : gpd.GeoDataFrame
+        Vector in the same projection as the raster.
+    raster : gdal.Dataset
+    window : tuple or None
+        Window (xsize, ysize, xoff, yoff) of the raster to find the pixels
+        in. If None, the whole raster.
+
+    Returns
+    -------
+    tuple[np.ndarray]
+        Column, row (int32) and (0 indexed) feature index of each pixel and
+        feature pair, ordered by feature.
+    """
+    geotransform = raster.GetGeoTransform()
+    pixel_bounds = get_pixel_bounds(gdf, geotransform)
+    if window is None:
+        window = (raster.RasterXSize, raster.RasterYSize, 0, 0)
+
+    # Clip the bounding boxes to the window.
+    xsize, ysize, xoff, yoff = window
+    pixel_bounds[:, [0, 2]] = np.clip(
+        pixel_bounds[:, [0, 2]], xoff, xoff + xsize)
+    pixel_bounds[:, [1, 3]] = np.clip(
+        pixel_bounds[:, [1, 3]], yoff, yoff + ysize)
+
+    # Scratch layer holding one feature at a time.
+    datasource = ogr.GetDriverByName('Memory').CreateDataSource('')
+    layer = datasource.CreateLayer('', geom_type=ogr.wkbUnknown)
+    layer_defn = layer.GetLayerDefn()
+    mem_driver = gdal.GetDriverByName('MEM')
+
+    cols, rows, index = [], [], []
+    for i, (geom, bounds) in enumerate(zip(gdf.geometry, pixel_bounds)):
+        col_min, row_min, col_max, row_max = (int(v) for v in bounds)
+        if geom is None or col_max <= col_min or row_max <= row_min:
+            continue
+
+        # Raster covering the bounding box of the feature.
+        out_ds = mem_driver.Create(
+            '', col_max - col_min, row_max - row_min, 1, gdal.GDT_Byte)
+        out_ds.SetGeoTransform([
+            geotransform[0] + col_min * geotransform[1] +
+            row_min * geotransform[2],
+            geotransform[1], geotransform[2],
+            geotransform[3] + col_min * geotransform[4] +
+            row_min * geotransform[5],
+            geotransform[4], geotransform[5]])
+
+        feature = ogr.Feature(layer_defn)
+        feature.SetGeometry(ogr.CreateGeometryFromWkb(geom.wkb))
+        layer.CreateFeature(feature)
+        gdal.RasterizeLayer(out_ds, [1], layer, burn_values=[1],
+                            options=['ALL_TOUCHED=TRUE'])
+        layer.DeleteFeature(feature.GetFID())
+
+        (i_px, j_px) = out_ds.GetRasterBand(1).ReadAsArray().nonzero()
+        rows.append((i_px + row_min).astype(np.int32))
+        cols.append((j_px + col_min).astype(np.int32))
+        index.append(np.full(len(i_px), i, dtype=np.int64))
+
+    if not index:
+        return (np.empty(0, dtype=np.int32), np.empty(0, dtype=np.int32),
+                np.empty(0, dtype=np.int64))
+    return (np.concatenate(cols), np.concatenate(rows),
+            np.concatenate(index))
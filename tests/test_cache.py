@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `rastertodataframe.cache` package."""
+
+import os
+import unittest
+import tempfile
+import shutil
+
+import numpy as np
+from osgeo import gdal
+import geopandas as gpd
+
+from rastertodataframe import util
+from rastertodataframe.cache import MaskCache
+
+
+class TestRasterToDataFrameCache(unittest.TestCase):
+    def setUp(self):
+        test_data_path = os.path.join(os.path.dirname(__file__), 'data')
+        self.vector_path = os.path.join(test_data_path, 'vector.geojson')
+        self.raster_wgs84_path = os.path.join(test_data_path,
+                                              'raster_epsg4326.tif')
+        self.vec_gdf = gpd.read_file(self.vector_path)
+        self.vec_gdf['__fid__'] = np.arange(1, len(self.vec_gdf) + 1)
+
+        # Temporary directory for the cache.
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_key(self):
+        ras = gdal.OpenShared(self.raster_wgs84_path)
+        key = MaskCache.key(ras, self.vec_gdf)
+        self.assertEqual(key, MaskCache.key(ras, self.vec_gdf.copy()))
+
+        # Different geometries give a different key.
+        self.assertNotEqual(key, MaskCache.key(ras, self.vec_gdf.iloc[::-1]))
+        self.assertNotEqual(key, MaskCache.key(ras, self.vec_gdf.iloc[:1]))
+
+    def test_get_mask(self):
+        cache = MaskCache(os.path.join(self.temp_dir, 'masks'))
+        mask = cache.get_mask(self.raster_wgs84_path, self.vec_gdf)
+
+        expected = util.burn_vector_mask_into_raster(
+            self.raster_wgs84_path, self.vec_gdf, vector_field='__fid__')
+        np.testing.assert_array_equal(
+            mask.ReadAsArray(), expected.ReadAsArray())
+        mask = None
+
+        # The mask is burned once and reused.
+        mask_paths = os.listdir(cache.cache_dir)
+        self.assertEqual(len(mask_paths), 1)
+        cache.get_mask(self.raster_wgs84_path, self.vec_gdf)
+        self.assertEqual(os.listdir(cache.cache_dir), mask_paths)
+
+    def test_evict(self):
+        cache = MaskCache(self.temp_dir, max_size=0)
+        cache.get_mask(self.raster_wgs84_path, self.vec_gdf)
+        cache.get_mask(self.raster_wgs84_path, self.vec_gdf.iloc[:1])
+
+        # Only the most recently used mask is kept.
+        self.assertEqual(
+            os.listdir(self.temp_dir),
+            [os.path.basename(cache.path(
+                MaskCache.key(gdal.OpenShared(self.raster_wgs84_path),
+                              self.vec_gdf.iloc[:1])))])
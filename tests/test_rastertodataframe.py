@@ -5,8 +5,28 @@
 
 import os
 import unittest
+import tempfile
+import shutil
 
-from rastertodataframe import raster_to_dataframe
+import numpy as np
+import pandas as pd
+from osgeo import gdal
+import geopandas as gpd
+from shapely.geometry import Point, box
+
+from rastertodataframe import (
+    raster_to_dataframe, iter_raster_to_dataframe, raster_to_parquet,
+    raster_to_dask_dataframe, sample_raster_to_dataframe, zonal_stats)
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:
+    pq = None
+
+try:
+    import dask.dataframe as dd
+except ImportError:
+    dd = None
 
 
 class TestRasterToDataFrame(unittest.TestCase):
@@ -18,6 +38,12 @@ class TestRasterToDataFrame(unittest.TestCase):
                                               'raster_epsg4326.tif')
         self.single_band_raster = os.path.join(test_data_path, 'oneband.tif')
 
+        # Temporary output directory for files.
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
     def test_raster_to_dataframe_with_vector(self):
         out_df = raster_to_dataframe(
             self.raster_wgs84_path, vector_path=self.vector_path)
@@ -28,6 +54,204 @@ class TestRasterToDataFrame(unittest.TestCase):
         self.assertEqual(out_df.shape, (267, 7))
         self.assertCountEqual(list(out_df.columns), expected_cols)
 
+    def test_raster_to_dataframe_vector_outside(self):
+        expected_df = raster_to_dataframe(
+            self.raster_wgs84_path, vector_path=self.vector_path)
+
+        # No pixels, but the same columns and band data types.
+        gdf = gpd.read_file(self.vector_path)
+        gdf['geometry'] = gdf.translate(xoff=100)
+        vector_path = os.path.join(self.temp_dir, 'outside.geojson')
+        gdf.to_file(vector_path, driver='GeoJSON')
+        out_df = raster_to_dataframe(
+            self.raster_wgs84_path, vector_path=vector_path)
+        self.assertEqual(len(out_df), 0)
+        self.assertListEqual(list(out_df.columns), list(expected_df.columns))
+        self.assertEqual(out_df['Band_1'].dtype, expected_df['Band_1'].dtype)
+
+    def test_raster_to_dataframe_attribute_clash(self):
+        expected_df = raster_to_dataframe(
+            self.raster_wgs84_path, vector_path=self.vector_path)
+
+        # An attribute named as a band is suffixed, the pixels are kept.
+        gdf = gpd.read_file(self.vector_path)
+        gdf['Band_1'] = gdf['value']
+        vector_path = os.path.join(self.temp_dir, 'clash.geojson')
+        gdf.to_file(vector_path, driver='GeoJSON')
+        out_df = raster_to_dataframe(
+            self.raster_wgs84_path, vector_path=vector_path)
+        np.testing.assert_array_equal(
+            out_df['Band_1'], expected_df['Band_1'])
+        np.testing.assert_array_equal(
+            out_df['Band_1_vector'], expected_df['value'])
+
+    def test_raster_to_dataframe_with_vector_on_disk(self):
+        out_df = raster_to_dataframe(
+            self.raster_wgs84_path, vector_path=self.vector_path,
+            in_memory=False)
+        self.assertEqual(out_df.shape, (267, 7))
+
+    def test_raster_to_dataframe_stack(self):
+        expected_df = raster_to_dataframe(
+            self.raster_wgs84_path, vector_path=self.vector_path)
+
+        # Same grid, stacked with suffixed band names.
+        out_df = raster_to_dataframe(
+            [self.raster_wgs84_path, self.raster_wgs84_path],
+            vector_path=self.vector_path, suffixes=['t0', 't1'])
+        self.assertEqual(out_df.shape, (267, 11))
+        for band in ['Band_1', 'Band_4']:
+            for suffix in ['t0', 't1']:
+                np.testing.assert_array_equal(
+                    out_df['{}_{}'.format(band, suffix)], expected_df[band])
+        np.testing.assert_array_equal(out_df['value'], expected_df['value'])
+
+        # File names are used as suffixes, so must be unique.
+        with self.assertRaises(ValueError):
+            raster_to_dataframe(
+                [self.raster_wgs84_path, self.raster_wgs84_path])
+
+        # Rasters on different grids.
+        with self.assertRaises(ValueError):
+            raster_to_dataframe([self.raster_wgs84_path, self.raster_path])
+
+    def test_raster_to_dataframe_reproject(self):
+        # Vector transformed to the raster EPSG, or the raster warped.
+        for reproject in ['vector', 'raster']:
+            out_df = raster_to_dataframe(
+                self.raster_path, vector_path=self.vector_path,
+                reproject=reproject)
+            self.assertGreater(len(out_df), 0)
+            self.assertCountEqual(out_df['value'].unique(), [1000, 2000])
+
+        # The mask of a warped VRT is written to a GeoTIFF on disk, or in
+        # the mask cache.
+        for kwargs in [dict(in_memory=False),
+                       dict(mask_cache=os.path.join(self.temp_dir, 'cache'))]:
+            out_df = raster_to_dataframe(
+                self.raster_path, vector_path=self.vector_path,
+                reproject='raster', **kwargs)
+            self.assertCountEqual(out_df['value'].unique(), [1000, 2000])
+
+        with self.assertRaises(ValueError):
+            raster_to_dataframe(
+                self.raster_path, vector_path=self.vector_path,
+                reproject=None)
+
+    def test_raster_to_dataframe_band_list(self):
+        expected_df = raster_to_dataframe(
+            self.raster_wgs84_path, vector_path=self.vector_path)
+        out_df = raster_to_dataframe(
+            self.raster_wgs84_path, vector_path=self.vector_path,
+            band_list=[3, 1])
+        expected_cols = ['Band_3', 'Band_1', 'fid', 'value', 'value_string']
+        pd.testing.assert_frame_equal(out_df, expected_df[expected_cols])
+
+        # The bands of a tile can be written to.
+        tile_df = next(iter_raster_to_dataframe(
+            self.raster_wgs84_path, band_list=[3, 1]))
+        tile_df.iloc[0, 0] = 5
+        self.assertEqual(tile_df.iloc[0, 0], 5)
+
+        with self.assertRaises(ValueError):
+            raster_to_dataframe(self.raster_wgs84_path, band_list=[5])
+
+    def test_raster_to_dataframe_resolution(self):
+        # 58x39 pixels read at half resolution, in one window.
+        out_df = raster_to_dataframe(
+            self.raster_wgs84_path, resolution=2, tile_size=64,
+            block_aligned=False)
+        self.assertEqual(out_df.shape, (29 * 20, 4))
+
+    def test_raster_to_dataframe_coords(self):
+        ras = gdal.OpenShared(self.raster_wgs84_path)
+        x_origin, x_res, _, y_origin, _, y_res = ras.GetGeoTransform()
+        arr = ras.ReadAsArray()
+
+        for vector_path in [None, self.vector_path]:
+            out_df = raster_to_dataframe(
+                self.raster_wgs84_path, vector_path=vector_path, coords=True)
+            self.assertListEqual(
+                list(out_df.columns[:5]), ['row', 'col', 'x', 'y', 'Band_1'])
+            self.assertEqual(out_df['row'].dtype, np.int32)
+
+            rows, cols = out_df['row'].values, out_df['col'].values
+            np.testing.assert_array_equal(
+                out_df['Band_1'], arr[0, rows, cols])
+            np.testing.assert_array_almost_equal(
+                out_df['x'], x_origin + (cols + 0.5) * x_res)
+            np.testing.assert_array_almost_equal(
+                out_df['y'], y_origin + (rows + 0.5) * y_res)
+
+        # Vector attributes named x and y do not replace the coordinates.
+        gdf = gpd.read_file(self.vector_path)
+        gdf['x'] = gdf['y'] = -1.0
+        vector_path = os.path.join(self.temp_dir, 'xy.geojson')
+        gdf.to_file(vector_path, driver='GeoJSON')
+        out_df = raster_to_dataframe(
+            self.raster_wgs84_path, vector_path=vector_path, coords=True)
+        np.testing.assert_array_almost_equal(
+            out_df['x'], x_origin + (out_df['col'].values + 0.5) * x_res)
+        self.assertTrue((out_df[['x_vector', 'y_vector']] == -1).all().all())
+
+    def test_raster_to_dataframe_memory_budget(self):
+        def sort(df):
+            return df.sort_values(list(df.columns)).reset_index(drop=True)
+
+        # Same pixels whatever the window size, maybe in another order.
+        expected_df = sort(raster_to_dataframe(
+            self.raster_wgs84_path, vector_path=self.vector_path))
+        for memory_budget in [1, 10000, 10 ** 9]:
+            out_df = raster_to_dataframe(
+                self.raster_wgs84_path, vector_path=self.vector_path,
+                memory_budget=memory_budget)
+            pd.testing.assert_frame_equal(sort(out_df), expected_df)
+
+    def test_raster_to_dataframe_mask_cache(self):
+        expected_df = raster_to_dataframe(
+            self.raster_wgs84_path, vector_path=self.vector_path)
+
+        # Burned on the first call, read from the cache on the second.
+        mask_cache = os.path.join(self.temp_dir, 'masks')
+        for _ in range(2):
+            out_df = raster_to_dataframe(
+                self.raster_wgs84_path, vector_path=self.vector_path,
+                mask_cache=mask_cache)
+            pd.testing.assert_frame_equal(out_df, expected_df)
+        self.assertEqual(len(os.listdir(mask_cache)), 1)
+
+    def _create_nodata_raster(self):
+        """2 band 2x2 raster with a no data value of 0."""
+        path = os.path.join(self.temp_dir, 'nodata.tif')
+        ras = gdal.GetDriverByName('GTiff').Create(
+            path, 2, 2, 2, gdal.GDT_UInt16)
+        ras.SetGeoTransform([0, 1, 0, 0, 0, -1])
+        data = np.array([[[1, 0], [3, 4]],
+                         [[0, 0], [7, 8]]])
+        for i in range(2):
+            band = ras.GetRasterBand(i + 1)
+            band.SetNoDataValue(0)
+            band.WriteArray(data[i])
+        ras = None
+        return path
+
+    def test_raster_to_dataframe_nodata(self):
+        nodata_raster = self._create_nodata_raster()
+
+        # Kept by default.
+        out_df = raster_to_dataframe(nodata_raster)
+        self.assertEqual(out_df.shape, (4, 2))
+
+        out_df = raster_to_dataframe(nodata_raster, nodata='any')
+        self.assertEqual(out_df.shape, (2, 2))
+
+        out_df = raster_to_dataframe(nodata_raster, nodata='all')
+        self.assertEqual(out_df.shape, (3, 2))
+
+        out_df = raster_to_dataframe(nodata_raster, nodata='nan')
+        self.assertEqual(out_df.shape, (4, 2))
+        self.assertEqual(out_df.isnull().values.sum(), 3)
+
     def test_raster_to_dataframe_without_vector(self):
         out_df = raster_to_dataframe(self.raster_path)
 
@@ -36,6 +260,11 @@ class TestRasterToDataFrame(unittest.TestCase):
         self.assertEqual(out_df.shape, (2204, 4))
         self.assertCountEqual(list(out_df.columns), expected_cols)
 
+        # One window covering the raster, pixels in row-major order.
+        arr = gdal.OpenShared(self.raster_path).ReadAsArray()
+        np.testing.assert_array_equal(
+            out_df[expected_cols].values, arr.reshape((4, -1)).T)
+
     def test_single_band_with_vector(self):
         out_df = raster_to_dataframe(
             self.single_band_raster, vector_path=self.vector_path)
@@ -52,3 +281,328 @@ class TestRasterToDataFrame(unittest.TestCase):
 
         self.assertEqual(out_df.shape, (2262, 1))
         self.assertCountEqual(list(out_df.columns), expected_cols)
+
+    def test_iter_raster_to_dataframe_with_vector(self):
+        tile_dfs = list(iter_raster_to_dataframe(
+            self.raster_wgs84_path, vector_path=self.vector_path,
+            tile_size=10, block_aligned=False))
+
+        # Small tiles are joined to the same pixels as a single tile. Only
+        # the 9 tiles touched by the features are read.
+        self.assertEqual(len(tile_dfs), 9)
+        self.assertTrue(all(len(df) <= 10 * 10 for df in tile_dfs))
+        self.assertEqual(pd.concat(tile_dfs).shape, (267, 7))
+
+    def test_iter_raster_to_dataframe_without_vector(self):
+        tile_dfs = list(iter_raster_to_dataframe(
+            self.raster_path, tile_size=10, block_aligned=False))
+
+        self.assertEqual(len(tile_dfs), 24)
+        self.assertEqual(pd.concat(tile_dfs).shape, (2204, 4))
+
+    @unittest.skipIf(pq is None, 'pyarrow not installed')
+    def test_raster_to_parquet_with_vector(self):
+        out_path = os.path.join(self.temp_dir, 'out.parquet')
+        num_rows = raster_to_parquet(
+            self.raster_wgs84_path, out_path, vector_path=self.vector_path,
+            tile_size=10, block_aligned=False)
+
+        parquet_file = pq.ParquetFile(out_path)
+        self.assertEqual(num_rows, 267)
+        self.assertEqual(parquet_file.metadata.num_rows, 267)
+        self.assertGreater(parquet_file.metadata.num_row_groups, 1)
+
+        out_df = parquet_file.read().to_pandas()
+        expected_df = raster_to_dataframe(
+            self.raster_wgs84_path, vector_path=self.vector_path)
+        self.assertCountEqual(list(out_df.columns), list(expected_df.columns))
+        self.assertEqual(out_df['Band_1'].dtype, expected_df['Band_1'].dtype)
+
+    @unittest.skipIf(pq is None, 'pyarrow not installed')
+    def test_raster_to_parquet_schema(self):
+        # A string attribute that is null in the first tiles.
+        gdf = gpd.read_file(self.vector_path)
+        gdf['value_string'] = gdf['value_string'].astype(object)
+        gdf.loc[gdf['value'] == 1000, 'value_string'] = None
+        vector_path = os.path.join(self.temp_dir, 'null.geojson')
+        gdf.to_file(vector_path, driver='GeoJSON')
+
+        out_path = os.path.join(self.temp_dir, 'out.parquet')
+        num_rows = raster_to_parquet(
+            self.raster_wgs84_path, out_path, vector_path=vector_path,
+            tile_size=10, block_aligned=False)
+        self.assertEqual(num_rows, 267)
+        out_df = pq.read_table(out_path).to_pandas()
+        self.assertEqual(out_df['value_string'].isnull().all(), False)
+
+        # A vector outside the raster still writes the columns.
+        gdf['geometry'] = gdf.translate(xoff=100)
+        vector_path = os.path.join(self.temp_dir, 'outside.geojson')
+        gdf.to_file(vector_path, driver='GeoJSON')
+        num_rows = raster_to_parquet(
+            self.raster_wgs84_path, out_path, vector_path=vector_path)
+        self.assertEqual(num_rows, 0)
+        self.assertIn('value_string', pq.read_table(out_path).column_names)
+
+    @unittest.skipIf(pq is None, 'pyarrow not installed')
+    def test_raster_to_parquet_without_vector(self):
+        out_path = os.path.join(self.temp_dir, 'out.parquet')
+        num_rows = raster_to_parquet(self.raster_path, out_path)
+
+        self.assertEqual(num_rows, 2204)
+        self.assertEqual(pq.ParquetFile(out_path).metadata.num_rows, 2204)
+
+    @unittest.skipIf(dd is None, 'dask not installed')
+    def test_raster_to_dask_dataframe_with_vector(self):
+        out_ddf = raster_to_dask_dataframe(
+            self.raster_wgs84_path, vector_path=self.vector_path,
+            tile_size=10, block_aligned=False)
+        self.assertGreater(out_ddf.npartitions, 1)
+
+        out_df = out_ddf.compute().reset_index(drop=True)
+        expected_df = raster_to_dataframe(
+            self.raster_wgs84_path, vector_path=self.vector_path,
+            tile_size=10, block_aligned=False)
+        pd.testing.assert_frame_equal(out_df, expected_df)
+
+        # Partitions only read their features, but keep all categories.
+        for kwargs in [dict(overlap=True), dict(categorical=True)]:
+            out_df = raster_to_dask_dataframe(
+                self.raster_wgs84_path, vector_path=self.vector_path,
+                tile_size=10, block_aligned=False, **kwargs).compute()
+            expected_df = raster_to_dataframe(
+                self.raster_wgs84_path, vector_path=self.vector_path,
+                tile_size=10, block_aligned=False, **kwargs)
+            pd.testing.assert_frame_equal(
+                out_df.reset_index(drop=True), expected_df)
+
+    @unittest.skipIf(dd is None, 'dask not installed')
+    def test_raster_to_dask_dataframe_mixed_vector(self):
+        ras = gdal.OpenShared(self.raster_wgs84_path)
+        x_origin, x_res, _, y_origin, _, y_res = ras.GetGeoTransform()
+
+        # Polygons and points, some partitions only touch points.
+        gdf = gpd.read_file(self.vector_path)[['value', 'geometry']]
+        points = gpd.GeoDataFrame(
+            {'value': [1, 2, 3]},
+            geometry=[Point(x_origin + (col + 0.5) * x_res,
+                            y_origin + (row + 0.5) * y_res)
+                      for col, row in [(2, 30), (5, 35), (50, 15)]],
+            crs=gdf.crs)
+        gdf = gpd.GeoDataFrame(
+            pd.concat([gdf, points], ignore_index=True), crs=gdf.crs)
+        vector_path = os.path.join(self.temp_dir, 'mixed.geojson')
+        gdf.to_file(vector_path, driver='GeoJSON')
+
+        out_df = raster_to_dask_dataframe(
+            self.raster_wgs84_path, vector_path=vector_path, tile_size=10,
+            block_aligned=False).compute().reset_index(drop=True)
+        expected_df = raster_to_dataframe(
+            self.raster_wgs84_path, vector_path=vector_path, tile_size=10,
+            block_aligned=False)
+        pd.testing.assert_frame_equal(out_df, expected_df)
+        self.assertCountEqual(
+            out_df.loc[out_df['value'] < 1000, 'value'], [1, 2, 3])
+
+    @unittest.skipIf(dd is None, 'dask not installed')
+    def test_raster_to_dask_dataframe_without_vector(self):
+        out_ddf = raster_to_dask_dataframe(
+            self.raster_path, tile_size=10, block_aligned=False,
+            windows_per_partition=4)
+        self.assertEqual(out_ddf.npartitions, 6)
+        self.assertTrue(out_ddf.known_divisions)
+
+        expected_df = raster_to_dataframe(
+            self.raster_path, tile_size=10, block_aligned=False)
+        pd.testing.assert_frame_equal(out_ddf.compute(), expected_df)
+
+    def test_raster_to_dataframe_workers(self):
+        # Same pixels in the same order as without workers.
+        expected_df = raster_to_dataframe(
+            self.raster_wgs84_path, vector_path=self.vector_path,
+            tile_size=10)
+        out_df = raster_to_dataframe(
+            self.raster_wgs84_path, vector_path=self.vector_path,
+            tile_size=10, workers=4)
+        pd.testing.assert_frame_equal(out_df, expected_df)
+
+        expected_df = raster_to_dataframe(self.raster_path, tile_size=10)
+        out_df = raster_to_dataframe(
+            self.raster_path, tile_size=10, workers=4)
+        pd.testing.assert_frame_equal(out_df, expected_df)
+
+    def test_raster_to_dataframe_prefetch(self):
+        # Same pixels in the same order as without prefetching.
+        for vector_path in [None, self.vector_path]:
+            expected_df = raster_to_dataframe(
+                self.raster_wgs84_path, vector_path=vector_path,
+                tile_size=10, nodata='any')
+            out_df = raster_to_dataframe(
+                self.raster_wgs84_path, vector_path=vector_path,
+                tile_size=10, nodata='any', prefetch=2)
+            pd.testing.assert_frame_equal(out_df, expected_df)
+
+    def test_iter_raster_to_dataframe_block_aligned(self):
+        # 58x38 raster in strips of 17 rows.
+        tile_dfs = list(iter_raster_to_dataframe(
+            self.raster_path, tile_size=10))
+        self.assertEqual(len(tile_dfs), 3)
+        self.assertEqual(len(tile_dfs[0]), 58 * 17)
+        self.assertEqual(pd.concat(tile_dfs).shape, (2204, 4))
+
+    def test_raster_to_dataframe_matches_iter(self):
+        # Preallocated output has the same rows as the concatenated tiles.
+        for vector_path in (None, self.vector_path):
+            out_df = raster_to_dataframe(
+                self.raster_wgs84_path, vector_path=vector_path,
+                tile_size=10, nodata='any')
+            tile_dfs = iter_raster_to_dataframe(
+                self.raster_wgs84_path, vector_path=vector_path,
+                tile_size=10, nodata='any')
+            pd.testing.assert_frame_equal(
+                out_df, pd.concat(tile_dfs, ignore_index=True))
+
+    def test_raster_to_dataframe_categorical(self):
+        out_df = raster_to_dataframe(
+            self.raster_wgs84_path, vector_path=self.vector_path,
+            categorical=True)
+        expected_df = raster_to_dataframe(
+            self.raster_wgs84_path, vector_path=self.vector_path)
+
+        self.assertEqual(out_df['value_string'].dtype.name, 'category')
+        self.assertCountEqual(
+            out_df['value_string'].cat.categories, ['first', 'second'])
+        self.assertListEqual(list(out_df['value_string'].astype(str)),
+                             list(expected_df['value_string']))
+
+    def test_zonal_stats(self):
+        stats_df = zonal_stats(
+            self.raster_wgs84_path, self.vector_path, bins=4,
+            hist_range=(0, 20000))
+
+        # One row per feature, with the vector attributes.
+        self.assertEqual(len(stats_df), 2)
+        self.assertIn('Band_1_mean', stats_df.columns)
+        self.assertIn('value_string', stats_df.columns)
+        self.assertEqual(stats_df['Band_1_count'].sum(), 267)
+
+        # Same as grouping all the pixels.
+        pixels_df = raster_to_dataframe(
+            self.raster_wgs84_path, vector_path=self.vector_path)
+        expected = pixels_df.groupby('fid')['Band_1'].agg(
+            ['count', 'sum', 'mean', 'min', 'max'])
+        for stat in expected.columns:
+            np.testing.assert_array_almost_equal(
+                stats_df['Band_1_{}'.format(stat)], expected[stat])
+        np.testing.assert_array_almost_equal(
+            stats_df['Band_1_std'],
+            pixels_df.groupby('fid')['Band_1'].std(ddof=0))
+        self.assertEqual(stats_df['Band_1_hist'][0].sum(),
+                         stats_df['Band_1_count'][0])
+
+    def test_zonal_stats_unknown_stat(self):
+        with self.assertRaises(ValueError):
+            zonal_stats(self.raster_wgs84_path, self.vector_path,
+                        stats=['median'])
+
+    def test_sample_raster_to_dataframe(self):
+        # At most 10 pixels of each feature.
+        out_df = sample_raster_to_dataframe(
+            self.raster_wgs84_path, vector_path=self.vector_path,
+            max_pixels=10, seed=0, tile_size=10, block_aligned=False)
+        self.assertListEqual(list(out_df.groupby('fid').size()), [10, 10])
+        self.assertEqual(out_df.shape[1], 7)
+
+        # Reproducible with a seed.
+        pd.testing.assert_frame_equal(out_df, sample_raster_to_dataframe(
+            self.raster_wgs84_path, vector_path=self.vector_path,
+            max_pixels=10, seed=0, tile_size=10, block_aligned=False))
+
+        # Stratified by an attribute.
+        out_df = sample_raster_to_dataframe(
+            self.raster_wgs84_path, vector_path=self.vector_path,
+            max_pixels=10, stratify_by='value_string', seed=0)
+        self.assertListEqual(
+            list(out_df.groupby('value_string').size()), [10, 10])
+
+        # A fraction of the whole raster.
+        out_df = sample_raster_to_dataframe(
+            self.raster_path, fraction=0.5, seed=0)
+        self.assertLess(len(out_df), 2204)
+        self.assertGreater(len(out_df), 0)
+
+    def test_sample_raster_to_dataframe_no_sample(self):
+        with self.assertRaises(ValueError):
+            sample_raster_to_dataframe(self.raster_path)
+
+    def test_raster_to_dataframe_points(self):
+        ras = gdal.OpenShared(self.raster_wgs84_path)
+        x_origin, x_res, _, y_origin, _, y_res = ras.GetGeoTransform()
+
+        # Points at pixel centres, two in the same pixel and one outside.
+        pixels = [(0, 0), (10, 5), (10, 5), (57, 38)]
+        points = [Point(x_origin + (col + 0.5) * x_res,
+                        y_origin + (row + 0.5) * y_res)
+                  for col, row in pixels]
+        points.append(Point(x_origin - x_res, y_origin))
+        gdf = gpd.GeoDataFrame(
+            {'point_id': range(len(points))}, geometry=points,
+            crs='EPSG:4326')
+        vector_path = os.path.join(self.temp_dir, 'points.geojson')
+        gdf.to_file(vector_path, driver='GeoJSON')
+
+        # One row per point inside the raster.
+        out_df = raster_to_dataframe(
+            self.raster_wgs84_path, vector_path=vector_path)
+        self.assertEqual(out_df.shape, (4, 5))
+        self.assertCountEqual(list(out_df['point_id']), [0, 1, 2, 3])
+
+        arr = ras.ReadAsArray()
+        out_df = out_df.set_index('point_id')
+        for point_id, (col, row) in enumerate(pixels):
+            self.assertEqual(out_df.loc[point_id, 'Band_1'], arr[0, row, col])
+
+    def test_raster_to_dataframe_overlap(self):
+        ras = gdal.OpenShared(self.raster_wgs84_path)
+        x_origin, x_res, _, y_origin, _, y_res = ras.GetGeoTransform()
+
+        # Two boxes overlapping by 5x5 pixels, inset from the pixel edges.
+        def pixel_box(col_min, row_min, col_max, row_max):
+            return box(x_origin + (col_min + 0.1) * x_res,
+                       y_origin + (row_max - 0.1) * y_res,
+                       x_origin + (col_max - 0.1) * x_res,
+                       y_origin + (row_min + 0.1) * y_res)
+        gdf = gpd.GeoDataFrame(
+            {'box_id': [1, 2]},
+            geometry=[pixel_box(0, 0, 10, 10), pixel_box(5, 5, 15, 15)],
+            crs='EPSG:4326')
+        vector_path = os.path.join(self.temp_dir, 'overlap.geojson')
+        gdf.to_file(vector_path, driver='GeoJSON')
+
+        # The shared pixels are only kept for the last feature by default.
+        out_df = raster_to_dataframe(
+            self.raster_wgs84_path, vector_path=vector_path)
+        self.assertEqual(len(out_df), 175)
+
+        out_df = raster_to_dataframe(
+            self.raster_wgs84_path, vector_path=vector_path, overlap=True)
+        self.assertEqual(len(out_df), 200)
+        self.assertEqual(list(out_df['box_id'].value_counts().sort_index()),
+                         [100, 100])
+
+        # Features split across windows are rasterized in each of them.
+        tiled_df = raster_to_dataframe(
+            self.raster_wgs84_path, vector_path=vector_path, overlap=True,
+            tile_size=4, block_aligned=False)
+        self.assertEqual(len(tiled_df), 200)
+        self.assertCountEqual(tiled_df['Band_1'], out_df['Band_1'])
+
+        # Rasterized by the workers, in the same order.
+        pd.testing.assert_frame_equal(tiled_df, raster_to_dataframe(
+            self.raster_wgs84_path, vector_path=vector_path, overlap=True,
+            tile_size=4, block_aligned=False, workers=3))
+
+        arr = ras.ReadAsArray()
+        self.assertCountEqual(
+            out_df.loc[out_df['box_id'] == 1, 'Band_1'],
+            arr[0, :10, :10].ravel())
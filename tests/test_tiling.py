@@ -5,6 +5,7 @@
 
 import os
 import unittest
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
 from osgeo import gdal
@@ -17,6 +18,8 @@ class TestRasterToDataFrameTiling(unittest.TestCase):
         test_data_path = os.path.join(os.path.dirname(__file__), 'data')
         raster_path = os.path.join(test_data_path, 'raster.tif')
         self.ras = gdal.OpenShared(raster_path)
+        self.single_band_ras = gdal.OpenShared(
+            os.path.join(test_data_path, 'oneband.tif'))
 
     @staticmethod
     def count_generator(generator):
@@ -37,6 +40,43 @@ class TestRasterToDataFrameTiling(unittest.TestCase):
         num_windows = self.count_generator(tiling.windows(self.ras, size=256))
         self.assertEqual(num_windows, 1)
 
+    def test_windows_row_major(self):
+        offsets = [(xoff, yoff)
+                   for _, _, xoff, yoff in tiling.windows(self.ras, size=25)]
+        self.assertListEqual(
+            offsets, [(0, 0), (25, 0), (50, 0), (0, 25), (25, 25), (50, 25)])
+
+    def test_block_window_size(self):
+        # 58x38 raster in strips of 17 rows, windows are whole strips.
+        self.assertEqual(tiling.block_window_size(self.ras, size=10), (58, 17))
+        self.assertEqual(tiling.block_window_size(self.ras, size=50), (58, 34))
+        self.assertEqual(
+            tiling.block_window_size(self.ras, size=256), (58, 38))
+
+    def test_windows_block_aligned(self):
+        wins = list(tiling.windows(self.ras, size=10, block_aligned=True))
+        self.assertListEqual(
+            wins, [(58, 17, 0, 0), (58, 17, 0, 17), (58, 4, 0, 34)])
+
+    def test_windows_bounds(self):
+        # Only windows intersecting the bounds.
+        bounds = np.array([[0, 0, 1, 1], [30, 20, 31, 21], [100, 0, 200, 5]])
+        wins = list(tiling.windows(self.ras, size=25, bounds=bounds))
+        self.assertListEqual(wins, [(25, 25, 0, 0), (25, 25, 25, 0)])
+
+    def test_touched_bounds(self):
+        bounds = np.array([[0, 0, 1, 1], [30, 20, 31, 21], [100, 0, 200, 5],
+                           [20, 20, 30, 30]])
+        index = tiling.bounds_index(self.ras, (25, 25), bounds)
+
+        touched = tiling.touched_bounds(index, [(25, 25, 0, 0)])
+        np.testing.assert_array_equal(touched, [0, 3])
+        touched = tiling.touched_bounds(index, [(25, 13, 25, 25)])
+        np.testing.assert_array_equal(touched, [3])
+        touched = tiling.touched_bounds(
+            index, [(25, 25, 0, 0), (25, 25, 25, 0)])
+        np.testing.assert_array_equal(touched, [0, 1, 3])
+
     def test_tiles(self):
         # Check the correct size array is being returned.
         arr = next(tiling.tiles(self.ras, size=5))
@@ -50,3 +90,78 @@ class TestRasterToDataFrameTiling(unittest.TestCase):
         arr = np.squeeze(next(tiling.tiles(self.ras, size=1)))
         self.assertEqual(arr.shape, (self.ras.RasterCount, ))
         self.assertListEqual(list(arr), [8778, 7731, 6943, 6267])
+
+    def test_tiles_single_band(self):
+        # Single band tiles are 2D with the same window shape.
+        windows = tiling.windows(self.single_band_ras, size=5)
+        for (xsize, ysize, _, _), arr in zip(
+                windows, tiling.tiles(self.single_band_ras, size=5)):
+            self.assertEqual(arr.shape, (ysize, xsize))
+
+    def test_tiles_prefetch(self):
+        # Same tiles in the same order as without prefetching.
+        expected = list(tiling.tiles(self.ras, size=10))
+        out = list(tiling.tiles(self.ras, size=10, prefetch=3))
+        self.assertEqual(len(out), len(expected))
+        for arr, expected_arr in zip(out, expected):
+            np.testing.assert_array_equal(arr, expected_arr)
+
+        # Stopping early does not read all the tiles.
+        self.assertEqual(
+            next(tiling.tiles(self.ras, size=5, prefetch=2)).shape,
+            (self.ras.RasterCount, 5, 5))
+
+    def test_budget_window_size(self):
+        pixel_bytes = sum(
+            gdal.GetDataTypeSize(self.ras.GetRasterBand(i).DataType) // 8
+            for i in range(1, self.ras.RasterCount + 1))
+
+        # Full width windows of as many rows (or strips) as fit.
+        self.assertEqual(tiling.budget_window_size(
+            self.ras, 58 * 5 * pixel_bytes), (58, 5))
+        self.assertEqual(tiling.budget_window_size(
+            self.ras, 58 * 40 * pixel_bytes, block_aligned=True), (58, 34))
+
+        # Part of a row, or at least one block.
+        self.assertEqual(tiling.budget_window_size(
+            self.ras, 20 * pixel_bytes), (20, 1))
+        self.assertEqual(tiling.budget_window_size(
+            self.ras, 1, block_aligned=True), (58, 17))
+
+        # Fewer bands read, larger windows.
+        self.assertEqual(tiling.budget_window_size(
+            self.ras, 20 * pixel_bytes, band_list=[1]), (58, 1))
+
+    def test_windows_memory_budget(self):
+        windows = list(tiling.windows(self.ras, memory_budget=1))
+        self.assertEqual(len(windows), 58 * 38)
+
+    def test_read_window(self):
+        arr = tiling.read_window(self.ras, (5, 4, 3, 2))
+        self.assertEqual(arr.shape, (self.ras.RasterCount, 4, 5))
+
+    def test_read_window_band_list(self):
+        full = tiling.read_window(self.ras, (5, 4, 3, 2))
+        arr = tiling.read_window(self.ras, (5, 4, 3, 2), band_list=[4, 2])
+        np.testing.assert_array_equal(arr, full[[3, 1]])
+
+        # A single band is returned as [y][x].
+        arr = tiling.read_window(self.ras, (5, 4, 3, 2), band_list=[3])
+        np.testing.assert_array_equal(arr, full[2])
+        self.assertTrue(arr.flags.writeable)
+
+    def test_read_window_resolution(self):
+        self.assertEqual(tiling.buffer_size((10, 7, 0, 0), 4), (3, 2))
+        arr = tiling.read_window(self.ras, (10, 7, 0, 0), resolution=4)
+        self.assertEqual(arr.shape, (self.ras.RasterCount, 2, 3))
+
+    def test_ordered_map(self):
+        args = [(i, ) for i in range(20)]
+
+        out = list(tiling.ordered_map(lambda x: x * 2, args))
+        self.assertListEqual(out, list(range(0, 40, 2)))
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            out = list(tiling.ordered_map(
+                lambda x: x * 2, args, executor=executor, depth=3))
+        self.assertListEqual(out, list(range(0, 40, 2)))
@@ -75,6 +75,14 @@ class TestRasterToDataFrameUtil(unittest.TestCase):
             util._epsg_from_projection(prj),
             32630)
 
+    def test__epsg_from_projection_cached(self):
+        ras = gdal.OpenShared(self.raster_wgs84_path)
+        util.get_epsg(ras)
+        hits = util._epsg_from_projection.cache_info().hits
+        self.assertEqual(util.get_epsg(ras), 4326)
+        self.assertEqual(
+            util._epsg_from_projection.cache_info().hits, hits + 1)
+
     def test_get_ogr_epsg(self):
         vec = ogr.OpenShared(self.vector_path)
         self.assertEqual(util.get_epsg(vec), 4326)
@@ -97,6 +105,18 @@ class TestRasterToDataFrameUtil(unittest.TestCase):
         with self.assertRaises(ValueError):
             util.get_epsg([])
 
+    def test_warp_raster(self):
+        out_path = os.path.join(self.temp_dir, 'warped.vrt')
+        out_ds = util.warp_raster(self.raster_path, 4326, out_path)
+        self.assertEqual(util.get_epsg(out_ds), 4326)
+        self.assertEqual(out_ds.RasterCount, 4)
+
+    def test_check_same_grid(self):
+        ras = gdal.OpenShared(self.raster_wgs84_path)
+        util.check_same_grid(ras, ras)
+        with self.assertRaises(ValueError):
+            util.check_same_grid(ras, gdal.OpenShared(self.raster_path))
+
     def test__create_empty_raster(self):
         tmp_fname = os.path.join(self.temp_dir, str(uuid.uuid1()))
 
@@ -113,7 +133,13 @@ class TestRasterToDataFrameUtil(unittest.TestCase):
         # Error for differing projections.
         with self.assertRaises(ValueError):
             _ = util.burn_vector_mask_into_raster(
-                self.raster_path, self.vector_path, '')
+                self.raster_path, self.vector_path, '', reproject=False)
+
+    def test_burn_vector_mask_into_raster_reproject(self):
+        # The vector is transformed to the raster EPSG.
+        out_ds = util.burn_vector_mask_into_raster(
+            self.raster_path, self.vector_path)
+        self.assertGreater(np.count_nonzero(out_ds.ReadAsArray()), 0)
 
     def test_burn_vector_mask_into_raster_vector_mask(self):
         # Burn in a specified vector field.
@@ -140,6 +166,24 @@ class TestRasterToDataFrameUtil(unittest.TestCase):
         self.assertEqual(arr.ndim, 2)
         self.assertEqual(arr.max(), 2000)
 
+    def test_burn_vector_mask_into_raster_in_memory(self):
+        # Burn a GeoDataFrame into a MEM raster.
+        gdf = gpd.read_file(self.vector_path)
+
+        out = util.burn_vector_mask_into_raster(
+            self.raster_wgs84_path, gdf, vector_field='value')
+
+        self.assertEqual(out.GetDriver().ShortName, 'MEM')
+        self.assertEqual(out.GetRasterBand(1).DataType, gdal.GDT_Int32)
+        arr = out.GetRasterBand(1).ReadAsArray()
+        self.assertEqual(arr.shape, (39, 58))
+        self.assertEqual(arr.max(), 2000)
+
+        # Constant burn value as a Byte mask.
+        out = util.burn_vector_mask_into_raster(self.raster_wgs84_path, gdf)
+        self.assertEqual(out.GetRasterBand(1).DataType, gdal.GDT_Byte)
+        self.assertEqual(out.GetRasterBand(1).ReadAsArray().max(), 1)
+
     def test_get_raster_band_names(self):
         ras = gdal.OpenShared(self.raster_path)
         band_names = util.get_raster_band_names(ras)
@@ -162,3 +206,113 @@ class TestRasterToDataFrameUtil(unittest.TestCase):
         mask[1, 1] = 5
         out = util.get_pixels(arr, mask, mask_val=5)
         self.assertEqual(np.sum(out.flatten()), 1)
+
+    def test_get_pixels_by_mask(self):
+        arr = np.arange(2 * 4 * 4).reshape((2, 4, 4))
+        mask = np.zeros((4, 4), dtype=np.int32)
+        mask[0, 0] = 2
+        mask[1, 1] = 1
+        mask[2, 2] = 2
+
+        pixels, mask_vals = util.get_pixels_by_mask(arr, mask)
+
+        # Grouped by mask value, masked (zero) pixels dropped.
+        np.testing.assert_array_equal(mask_vals, [1, 2, 2])
+        np.testing.assert_array_equal(pixels, [[5, 0, 10], [21, 16, 26]])
+
+        # Single band.
+        pixels, mask_vals = util.get_pixels_by_mask(arr[0], mask)
+        np.testing.assert_array_equal(pixels, [5, 0, 10])
+
+        # Row and column of each pixel.
+        _, _, (rows, cols) = util.get_pixels_by_mask(
+            arr, mask, return_index=True)
+        np.testing.assert_array_equal(rows, [1, 0, 2])
+        np.testing.assert_array_equal(cols, [1, 0, 2])
+
+    def test_get_nodata_values(self):
+        ras = gdal.OpenShared(self.raster_wgs84_path)
+        self.assertListEqual(util.get_nodata_values(ras), [65535.0] * 4)
+
+    def test_get_valid_pixels(self):
+        arr = np.array([[[1, 0], [3, 4]],
+                        [[0, 0], [7, 8]]])
+
+        valid = util.get_valid_pixels(arr, [0, None])
+        self.assertEqual(valid.sum(), 7)
+        self.assertFalse(valid[0, 0, 1])
+
+        # Mask bands also invalidate pixels.
+        mask = np.full(arr.shape, 255)
+        mask[:, 1, 1] = 0
+        valid = util.get_valid_pixels(arr, [0, 0], mask=mask)
+        self.assertEqual(valid.sum(), 4)
+
+        # NaN no data.
+        arr = np.array([[np.nan, 1.0]])
+        valid = util.get_valid_pixels(arr, [np.nan])
+        np.testing.assert_array_equal(valid, [[False, True]])
+
+    def test_apply_nodata_policy(self):
+        arr = np.array([[[1, 0], [3, 4]],
+                        [[0, 0], [7, 8]]], dtype=np.uint16)
+        valid = util.get_valid_pixels(arr, [0, 0])
+
+        _, keep = util.apply_nodata_policy(arr, valid, nodata='any')
+        np.testing.assert_array_equal(keep, [[False, False], [True, True]])
+
+        _, keep = util.apply_nodata_policy(arr, valid, nodata='all')
+        np.testing.assert_array_equal(keep, [[True, False], [True, True]])
+
+        out, keep = util.apply_nodata_policy(arr, valid, nodata='nan')
+        self.assertTrue(keep.all())
+        self.assertEqual(out.dtype, np.float32)
+        self.assertEqual(np.isnan(out).sum(), 3)
+
+        with self.assertRaises(ValueError):
+            util.apply_nodata_policy(arr, valid, nodata='unknown')
+
+    def test_geo_to_pixel(self):
+        geotransform = [100, 10, 0, 200, 0, -10]
+        col, row = util.geo_to_pixel(
+            geotransform, np.array([100, 125]), np.array([200, 165]))
+        np.testing.assert_array_almost_equal(col, [0, 2.5])
+        np.testing.assert_array_almost_equal(row, [0, 3.5])
+
+    def test_pixel_to_geo(self):
+        geotransform = [100, 10, 0, 200, 0, -10]
+        x, y = util.pixel_to_geo(
+            geotransform, np.array([0, 2.5]), np.array([0, 3.5]))
+        np.testing.assert_array_almost_equal(x, [100, 125])
+        np.testing.assert_array_almost_equal(y, [200, 165])
+
+    def test_get_pixel_bounds(self):
+        ras = gdal.OpenShared(self.raster_wgs84_path)
+        gdf = gpd.read_file(self.vector_path)
+
+        bounds = util.get_pixel_bounds(gdf, ras.GetGeoTransform())
+        np.testing.assert_array_equal(
+            bounds, [[18, 1, 40, 9], [25, 17, 37, 38]])
+
+    def test_get_feature_pixels(self):
+        ras = gdal.OpenShared(self.raster_wgs84_path)
+        gdf = gpd.read_file(self.vector_path)
+
+        # Same pixels as the burned mask, the features do not overlap.
+        cols, rows, index = util.get_feature_pixels(gdf, ras)
+        mask = util.burn_vector_mask_into_raster(
+            self.raster_wgs84_path, self.vector_path,
+            vector_field='value').ReadAsArray()
+        np.testing.assert_array_equal(
+            mask[rows, cols], gdf['value'].values[index])
+        self.assertEqual(len(index), np.count_nonzero(mask))
+
+        # Only the pixels in a window.
+        window = (10, 10, 20, 5)
+        w_cols, w_rows, w_index = util.get_feature_pixels(
+            gdf, ras, window=window)
+        inside = (cols >= 20) & (cols < 30) & (rows >= 5) & (rows < 15)
+        self.assertEqual(w_cols.dtype, np.int32)
+        np.testing.assert_array_equal(w_cols, cols[inside])
+        np.testing.assert_array_equal(w_rows, rows[inside])
+        np.testing.assert_array_equal(w_index, index[inside])